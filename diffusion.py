@@ -9,8 +9,12 @@ from copy import deepcopy
 from getopt import getopt, GetoptError
 from random import sample
 from stencil_generator import generate_code, generate_makefile, build_experiment
-from stencil_generator import parse_results, generate_script, write_results
-from stencil_optimizer import optimize_program
+from stencil_generator import parse_results, generate_script, write_results, ADAPTIVE
+from stencil_optimizer import optimize_program, canonical_problem, canonical_tiling
+from stencil_interpreter import verify_tiling
+from stencil_cache import rank_tilings
+from stencil_profiler import enable_profiling, write_profiles, copy_program
+from stencil_pipeline import run_pipeline
 
 # stencil program code
 STENCILS = {
@@ -73,7 +77,12 @@ PROGRAM = {
     "CACHE" : {"BODY" : 9.44e-8, "PEEL" : 9.95e-7},
     "OVERLAP" : 1.0,
     "SLACK" : {"SIZE" : 0.02, "CORES" : 0.05},
+    "SOLVER" : {"MIPGAP" : None, "TIMELIMIT" : None, "THREADS" : None, "EMPHASIS" : None,
+               "NODELIMIT" : None, "POOL" : None, "POOLGAP" : 0.1, "METHOD" : "MILP"},
     "CONSTRAINTS": {},
+    "COUNTS" : "BINARY",
+    "DECOMPOSE" : None,
+    "WINDOW" : None,
     "X" : 64,
     "Y" : 64,
     "Z" : 60,
@@ -86,20 +95,36 @@ PROGRAM = {
 }
 
 # generate optimized code
-def search_optimum(experiments, folder):
+def search_optimum(experiments, folder, search=False, emit=None):
     """
     search the optimal implementation variant
     """
-    program = deepcopy(PROGRAM)
+    program = copy_program(PROGRAM)
     sequence = ["ulap", "ufli", "uflj", "uout", "vlap", "vfli", "vflj", "vout",
                 "wlap", "wfli", "wflj", "wout", "pplap", "ppfli", "ppflj", "ppout"]
     program["STENCILS"] = STENCILS
     program["SEQUENCE"] = sequence
+    # search the stencil order starting from the given sequence
+    if search:
+        program["ORDER"] = "SEARCH"
     optimize_program(folder + program["NAME"], program)
     experiments[program["NAME"]] = program
+    # add the other plans of the solution pool
+    for index, plan in enumerate(program.get("POOL", [])):
+        if plan["TILING"] == program["TILING"]:
+            continue
+        name = program["NAME"] + "-" + str(index)
+        experiments[name] = copy_program(program)
+        experiments[name]["VARIANT"] = name
+        experiments[name]["TILING"] = plan["TILING"]
+        experiments[name]["OBJECTIVE"] = plan["OBJECTIVE"]
+    # pass the variants on to the pipeline
+    if emit is not None:
+        for name, variant in experiments.items():
+            emit(name, variant)
 
 # generate program variants for the auto-tuning
-def auto_tune(experiments):
+def auto_tune(experiments, emit=None):
     """
     create auto-tuning variants
     """
@@ -117,7 +142,7 @@ def auto_tune(experiments):
                     if nx * ny * nz >= PROGRAM["MACHINE"]["CORES"]:
                         name = PROGRAM["NAME"]
                         name = name + "-" + str(idx) + "-" + str(nx) + "-" + str(ny) + "-" + str(nz)
-                        experiments[name] = deepcopy(PROGRAM)
+                        experiments[name] = copy_program(PROGRAM)
                         experiments[name]["RUNS"] = 16
                         experiments[name]["VARIANT"] = name
                         experiments[name]["STENCILS"] = stencils
@@ -132,9 +157,11 @@ def auto_tune(experiments):
                                 }]
                             }]
                         }
+                        if emit is not None:
+                            emit(name, experiments[name])
 
 # generate partly optimal codes
-def explore_space(experiments, folder):
+def explore_space(experiments, folder, emit=None):
     """
     explore the space of close to optimal implementation variants
     """
@@ -142,7 +169,7 @@ def explore_space(experiments, folder):
                 "wlap", "wfli", "wflj", "wout", "pplap", "ppfli", "ppflj", "ppout"]
     # optimal solution
     name = "OPT"
-    experiments[name] = deepcopy(PROGRAM)
+    experiments[name] = copy_program(PROGRAM)
     experiments[name]["STENCILS"] = STENCILS
     experiments[name]["VARIANT"] = name
     experiments[name]["SEQUENCE"] = sequence
@@ -155,7 +182,7 @@ def explore_space(experiments, folder):
     experiments[name]["CONSTRAINTS"]["GROUPS"] = constraints
     # hand tuned
     name = "HAND"
-    experiments[name] = deepcopy(PROGRAM)
+    experiments[name] = copy_program(PROGRAM)
     experiments[name]["STENCILS"] = STENCILS
     experiments[name]["VARIANT"] = name
     experiments[name]["SEQUENCE"] = sequence
@@ -172,7 +199,7 @@ def explore_space(experiments, folder):
     optimize_program(folder + name, experiments[name])
     # auto-tuning
     name = "AUTO"
-    experiments[name] = deepcopy(PROGRAM)
+    experiments[name] = copy_program(PROGRAM)
     experiments[name]["STENCILS"] = STENCILS
     experiments[name]["VARIANT"] = name
     experiments[name]["SEQUENCE"] = sequence
@@ -189,7 +216,7 @@ def explore_space(experiments, folder):
     optimize_program(folder + name, experiments[name])
     # maximal fusion
     name = "MAX"
-    experiments[name] = deepcopy(PROGRAM)
+    experiments[name] = copy_program(PROGRAM)
     experiments[name]["STENCILS"] = STENCILS
     experiments[name]["VARIANT"] = name
     experiments[name]["SEQUENCE"] = sequence
@@ -197,12 +224,16 @@ def explore_space(experiments, folder):
     optimize_program(folder + name, experiments[name])
     # minimal fusion
     name = "MIN"
-    experiments[name] = deepcopy(PROGRAM)
+    experiments[name] = copy_program(PROGRAM)
     experiments[name]["STENCILS"] = STENCILS
     experiments[name]["VARIANT"] = name
     experiments[name]["SEQUENCE"] = sequence
     experiments[name]["CONSTRAINTS"]["GROUPS"] = [(x, idx) for idx, x in enumerate(sequence)]
     optimize_program(folder + name, experiments[name])
+    # pass the special variants on to the pipeline
+    if emit is not None:
+        for key, program in experiments.items():
+            emit(key, program)
     # compute stencil programs with different group assignments
     variants = []
     def generate_variants(current, sequence):
@@ -225,23 +256,51 @@ def explore_space(experiments, folder):
     for experiment in experiments.values():
         variants.append(experiment["CONSTRAINTS"]["GROUPS"])
     exploration = {}
+    # index the solved problems (the optimal groups were constrained after the solve)
+    solved = dict([(canonical_problem(y), y) for x, y in experiments.items() if x != "OPT"])
+    plans = set([canonical_tiling(x["TILING"]) for x in experiments.values()])
+    def solve_variant(key):
+        """
+        optimize the variant unless an equivalent problem was solved before
+        """
+        problem = canonical_problem(exploration[key])
+        if problem in solved:
+            print("-> found equivalent problem " + key)
+            for entry, value in solved[problem].items():
+                exploration[key].setdefault(entry, value)
+            return
+        optimize_program(folder + key, exploration[key])
+        solved[problem] = exploration[key]
+    def add_variant(key):
+        """
+        add the variant unless an experiment with the same tiling exists
+        """
+        plan = canonical_tiling(exploration[key]["TILING"])
+        if plan in plans:
+            print("-> found existing experiment " + key)
+            return
+        plans.add(plan)
+        experiments[key] = exploration[key]
+        if emit is not None:
+            emit(key, exploration[key])
     # setup the experiments
     name = PROGRAM["NAME"]
     for variant in variants:
         key = name + "-" + "-".join([str(index) for _, index in variant])
-        exploration[key] = deepcopy(PROGRAM)
+        exploration[key] = copy_program(PROGRAM)
         exploration[key]["NAME"] = key
         exploration[key]["VARIANT"] = key
         exploration[key]["STENCILS"] = STENCILS
         exploration[key]["SEQUENCE"] = sequence
         exploration[key]["CONSTRAINTS"]["GROUPS"] = variant
-        optimize_program(folder + key, exploration[key])
+        solve_variant(key)
+        add_variant(key)
         # generate variants with different tile counts
         groups = exploration[key]["TILING"]["GROUPS"]
         # generate variants with smaller tiles
         for dimension in ["x", "y", "z"]:
             key = name + "-" + "-".join([str(index) for _, index in variant]) + "-m" + dimension
-            exploration[key] = deepcopy(PROGRAM)
+            exploration[key] = copy_program(PROGRAM)
             exploration[key]["NAME"] = key
             exploration[key]["VARIANT"] = key
             exploration[key]["STENCILS"] = STENCILS
@@ -254,11 +313,12 @@ def explore_space(experiments, folder):
                     for stencil in info["STENCILS"]:
                         constraint = (dimension, stencil, -info["N" + dimension.upper()])
                         exploration[key]["CONSTRAINTS"]["TILING"].append(constraint)
-            optimize_program(folder + key, exploration[key])
+            solve_variant(key)
+            add_variant(key)
         # generate variants with larger tiles
         for dimension in ["x", "y", "z"]:
             key = name + "-" + "-".join([str(index) for _, index in variant]) + "-p" + dimension
-            exploration[key] = deepcopy(PROGRAM)
+            exploration[key] = copy_program(PROGRAM)
             exploration[key]["NAME"] = key
             exploration[key]["VARIANT"] = key
             exploration[key]["STENCILS"] = STENCILS
@@ -271,28 +331,22 @@ def explore_space(experiments, folder):
                     for stencil in info["STENCILS"]:
                         constraint = (dimension, stencil, info["N" + dimension.upper()])
                         exploration[key]["CONSTRAINTS"]["TILING"].append(constraint)
-            optimize_program(folder + key, exploration[key])
-    # remove duplicates
-    for key, program in exploration.items():
-        found = False
-        for existing in experiments.values():
-            if existing["TILING"] == program["TILING"]:
-                found = True
-                print("-> found existing experiment " + key)
-        if not found:
-            experiments[key] = program
+            solve_variant(key)
+            add_variant(key)
 
 # store the results of the code generation
 def store_objectives(experiments, folder):
     """
     store the estimated performance of the implementation variants
     """
-    header = ["VAR", "EST"]
+    header = ["VAR", "EST", "GAP", "SOLVE"]
     with open(folder + "estimates.csv", "w") as file:
         csv = writer(file, delimiter=",", quotechar="'", lineterminator="\n")
         csv.writerow(header)
         for _, program in experiments.items():
-            csv.writerow([program["VARIANT"], str(program["OBJECTIVE"])])
+            telemetry = program["TELEMETRY"]
+            csv.writerow([program["VARIANT"], str(program["OBJECTIVE"]),
+                          str(telemetry["GAP"]), str(telemetry["TIME"])])
 
 # the main program
 def main(arguments):
@@ -302,11 +356,24 @@ def main(arguments):
     auto = False
     generate = False
     build = False
+    repeat = False
+    interpret = False
+    simulate = False
+    method = None
+    search = False
+    candidates = False
+    shared = None
+    window = None
+    pool = None
+    profile = False
+    pipeline = False
     parse = None
     folder = "./"
     try:
-        short = "oeagbp:f:"
-        extended = ["optimize", "explore", "auto", "generate", "build", "parse=", "folder="]
+        short = "oeagbricstxld:w:k:m:p:f:"
+        extended = ["optimize", "explore", "auto", "generate", "build", "repeat", "interpret",
+                    "cache", "search", "candidates", "profile", "pipeline", "decompose=", "window=",
+                    "pool=", "method=", "parse=", "folder="]
         opts, _ = getopt(arguments, short, extended)
     except GetoptError:
         print(PROGRAM["NAME"] + ".py -f <folder>")
@@ -322,6 +389,28 @@ def main(arguments):
             generate = True
         elif opt in ("-b", "--build"):
             build = True
+        elif opt in ("-r", "--repeat"):
+            repeat = True
+        elif opt in ("-i", "--interpret"):
+            interpret = True
+        elif opt in ("-c", "--cache"):
+            simulate = True
+        elif opt in ("-s", "--search"):
+            search = True
+        elif opt in ("-t", "--candidates"):
+            candidates = True
+        elif opt in ("-x", "--profile"):
+            profile = True
+        elif opt in ("-l", "--pipeline"):
+            pipeline = True
+        elif opt in ("-d", "--decompose"):
+            shared = int(arg)
+        elif opt in ("-w", "--window"):
+            window = int(arg)
+        elif opt in ("-k", "--pool"):
+            pool = int(arg)
+        elif opt in ("-m", "--method"):
+            method = arg.upper()
         elif opt in ("-p", "--parse"):
             parse = arg
         elif opt in ("-f", "--folder"):
@@ -332,22 +421,78 @@ def main(arguments):
     print("-> auto: " + str(auto))
     print("-> run generation: " + str(generate))
     print("-> run compilation: " + str(build))
+    print("-> adaptive repetition: " + str(repeat))
+    print("-> interpret: " + str(interpret))
+    print("-> simulate caches: " + str(simulate))
+    print("-> method: " + str(method))
+    print("-> search order: " + str(search))
+    print("-> tile count candidates: " + str(candidates))
+    print("-> decompose: " + str(shared))
+    print("-> window: " + str(window))
+    print("-> solution pool: " + str(pool))
+    print("-> profile: " + str(profile))
+    print("-> pipeline: " + str(pipeline))
+    # measure the time of the optimization and code generation phases
+    if profile:
+        enable_profiling()
+    # select the linear program, the heuristic, or the heuristic as mip start
+    if method is not None:
+        assert method in ("MILP", "DP", "WARM"), "unknown optimization method " + method
+        PROGRAM["SOLVER"]["METHOD"] = method
+    # select the tile counts from the divisors of the domain and the multiples of the cores
+    if candidates:
+        PROGRAM["COUNTS"] = "CANDIDATES"
+    # solve the components that share at most the given number of arrays separately
+    if shared is not None:
+        PROGRAM["DECOMPOSE"] = shared
+    # optimize the sequence in windows of the given number of stencils
+    if window is not None:
+        PROGRAM["WINDOW"] = window
+    # collect the best distinct plans of a single solve
+    if pool is not None:
+        PROGRAM["SOLVER"]["POOL"] = pool
     experiments = {}
-    if explore:
+    # stream every variant through the generation, build, and run as soon as it is optimized
+    if pipeline and (explore or optimize or auto):
+        if repeat:
+            PROGRAM["ADAPTIVE"] = deepcopy(ADAPTIVE)
+        if explore:
+            produce = lambda emit: explore_space({}, folder, emit)
+        elif optimize:
+            produce = lambda emit: search_optimum({}, folder, search, emit)
+        else:
+            produce = lambda emit: auto_tune({}, emit)
+        experiments = run_pipeline(produce, folder, "template_tiling.cpp",
+                                   PROGRAM["MACHINE"]["CORES"])
+        if explore:
+            store_objectives(experiments, folder)
+    elif explore:
         explore_space(experiments, folder)
         store_objectives(experiments, folder)
     elif optimize:
-        search_optimum(experiments, folder)
+        search_optimum(experiments, folder, search)
     elif auto:
         auto_tune(experiments)
+    # verify the variants with the numpy interpreter
+    if interpret:
+        for _, program in experiments.items():
+            verify_tiling(program)
+    # rank the variants by their simulated cache misses
+    if simulate:
+        rank_tilings(experiments)
+    # repeat the measurements until the median is accurate enough
+    if repeat:
+        for _, program in experiments.items():
+            program["ADAPTIVE"] = deepcopy(ADAPTIVE)
     # generate scripts and source code
-    if generate:
+    if generate and not pipeline:
         for name, program in experiments.items():
             generate_code("template_tiling.cpp", folder + name + ".cpp", program)
+    if generate or pipeline:
         generate_makefile(folder + "Makefile", experiments)
         generate_script(folder + "run.sh", experiments, PROGRAM["MACHINE"]["CORES"], 1)
     # build the code
-    if build:
+    if build and not pipeline:
         for name, _ in experiments.items():
             build_experiment(folder + name)
     # parse the results
@@ -358,6 +503,8 @@ def main(arguments):
         else:
             rows = parse_results(folder + parse)
             write_results(rows, folder + "results.csv")
+    # write the profile of every experiment and the summary
+    write_profiles(folder)
 
 if __name__ == "__main__":
     main(argv[1:])
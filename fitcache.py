@@ -5,9 +5,9 @@
 import sys
 import os
 import getopt
-import copy
-from stencil_generator import generate_code, generate_script, generate_makefile
+from stencil_generator import generate_code, generate_script, generate_makefile, generate_sizes
 from stencil_generator import build_experiment, write_results, parse_results
+from stencil_sampler import compute_candidates, define_experiment, define_sweep, sample_training
 
 # set the core count of the target system
 CORES = 4
@@ -84,25 +84,51 @@ TILING = {
         }]
 }
 
+# training stencils and domain sizes
+FAMILIES = {"PT8": PT8, "PT12": PT12, "PT16": PT16, "PT20": PT20}
+XLENS = [10, 20, 30, 50, 80]
+YLENS = [1, 2, 3, 5, 8, 13, 21, 34, 55]
+ZLENS = [1, 2, 3, 5, 8, 13, 21, 34, 55]
+STEPS = 9
+
+# compute the model variables (see fitcache.R)
+def compute_features(variant, xlen, ylen, zlen):
+    """ return the body and peel variables of the cache model """
+    fac = int(variant[2:])
+    return [fac * STEPS * xlen * ylen * zlen, fac * STEPS * ylen * zlen]
+
+# training configuration of the adaptive sampling (see stencil_sampler.py)
+TRAINING = {
+    "PROGRAM" : PROGRAM, "TILING" : TILING, "FAMILIES" : FAMILIES, "CORES" : CORES,
+    "XLENS" : XLENS, "YLENS" : YLENS, "ZLENS" : ZLENS,
+    "FEATURES" : compute_features, "COEFFICIENTS" : ["body", "peel"]
+}
+
 # the main program
 def main(argv):
     """ main method used to run the experiments """
     generate = False
     build = False
+    adaptive = False
+    sweep = False
     parse = None
     folder = "./"
     try:
-        short = "gbvp:f:"
-        extended = ["generate", "build", "verify", "parse=", "folder="]
+        short = "gbvasp:f:"
+        extended = ["generate", "build", "verify", "adaptive", "sweep", "parse=", "folder="]
         opts, _ = getopt.getopt(argv, short, extended)
     except getopt.GetoptError:
-        print(PROGRAM["NAME"] + ".py -g -b -v -p <file> -f <folder>")
+        print(PROGRAM["NAME"] + ".py -g -b -v -a -s -p <file> -f <folder>")
         sys.exit(2)
     for opt, arg in opts:
         if opt in ("-g", "--generate"):
             generate = True
         elif opt in ("-b", "--build"):
             build = True
+        elif opt in ("-a", "--adaptive"):
+            adaptive = True
+        elif opt in ("-s", "--sweep"):
+            sweep = True
         elif opt in ("-p", "--parse"):
             parse = arg
         elif opt in ("-f", "--folder"):
@@ -110,70 +136,33 @@ def main(argv):
     print("-> working dir: " + folder)
     print("-> run generation: " + str(generate))
     print("-> run compilation: " + str(build))
+    print("-> adaptive sampling: " + str(adaptive))
+    print("-> runtime sized sweep: " + str(sweep))
     if parse is not None:
         print("-> parse file: " + folder + parse)
     # generate different configurations
     experiments = {}
-    for xlen in [10, 20, 30, 50, 80]:
-        for ylen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-            for zlen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-                total = xlen * ylen * zlen
-                if total >= 500 and total <= 2000:
-                    program = copy.deepcopy(PROGRAM)
-                    program["X"] = 2 * xlen
-                    program["Y"] = 2 * ylen
-                    program["Z"] = (5 * CORES) * zlen
-                    program["TILING"] = copy.deepcopy(TILING)
-                    program["STENCILS"] = copy.deepcopy(PT8)
-                    program["VARIANT"] = str("PT8")
-                    domain = str(program["X"]) + "x" + str(program["Y"]) + "x" + str(program["Z"])
-                    experiments[program["VARIANT"] + "-" + domain] = program
-    for xlen in [10, 20, 30, 50, 80]:
-        for ylen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-            for zlen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-                total = xlen * ylen * zlen
-                if total >= 500 and total <= 2000:
-                    program = copy.deepcopy(PROGRAM)
-                    program["X"] = 2 * xlen
-                    program["Y"] = 2 * ylen
-                    program["Z"] = (5 * CORES) * zlen
-                    program["TILING"] = copy.deepcopy(TILING)
-                    program["STENCILS"] = copy.deepcopy(PT12)
-                    program["VARIANT"] = str("PT12")
-                    domain = str(program["X"]) + "x" + str(program["Y"]) + "x" + str(program["Z"])
-                    experiments[program["VARIANT"] + "-" + domain] = program
-    for xlen in [10, 20, 30, 50, 80]:
-        for ylen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-            for zlen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-                total = xlen * ylen * zlen
-                if total >= 500 and total <= 2000:
-                    program = copy.deepcopy(PROGRAM)
-                    program["X"] = 2 * xlen
-                    program["Y"] = 2 * ylen
-                    program["Z"] = (5 * CORES) * zlen
-                    program["TILING"] = copy.deepcopy(TILING)
-                    program["STENCILS"] = copy.deepcopy(PT16)
-                    program["VARIANT"] = str("PT16")
-                    domain = str(program["X"]) + "x" + str(program["Y"]) + "x" + str(program["Z"])
-                    experiments[program["VARIANT"] + "-" + domain] = program
-    for xlen in [10, 20, 30, 50, 80]:
-        for ylen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-            for zlen in [1, 2, 3, 5, 8, 13, 21, 34, 55]:
-                total = xlen * ylen * zlen
-                if total >= 500 and total <= 2000:
-                    program = copy.deepcopy(PROGRAM)
-                    program["X"] = 2 * xlen
-                    program["Y"] = 2 * ylen
-                    program["Z"] = (5 * CORES) * zlen
-                    program["TILING"] = copy.deepcopy(TILING)
-                    program["STENCILS"] = copy.deepcopy(PT20)
-                    program["VARIANT"] = str("PT20")
-                    domain = str(program["X"]) + "x" + str(program["Y"]) + "x" + str(program["Z"])
-                    experiments[program["VARIANT"] + "-" + domain] = program
+    if adaptive:
+        # train the model with the stencils that have more than ten fetches
+        families = [x for x in FAMILIES if int(x[2:]) >= 10]
+        sample_training(TRAINING, families, folder)
+    elif sweep:
+        # compile one runtime sized binary per family
+        configurations = compute_candidates(FAMILIES, XLENS, YLENS, ZLENS)
+        for family in sorted(set([x[0] for x in configurations])):
+            name, program = define_sweep(TRAINING, family, configurations)
+            experiments[name] = program
+    else:
+        for configuration in compute_candidates(FAMILIES, XLENS, YLENS, ZLENS):
+            name, program = define_experiment(TRAINING, *configuration)
+            experiments[name] = program
     # generate source code
     if generate:
         for name, experiment in experiments.items():
-            generate_code("template_training.cpp", folder + name + ".cpp", experiment)
+            template = "template_sweep.cpp" if sweep else "template_training.cpp"
+            generate_code(template, folder + name + ".cpp", experiment)
+            if sweep:
+                generate_sizes(folder + name + ".sizes", experiment["SIZES"])
         # generate the run script
         generate_makefile(folder + "Makefile", experiments)
         generate_script(folder + "run.sh", experiments, CORES, 1)
@@ -0,0 +1,138 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module benchmarks the optimizer phases on synthetic stencil programs """
+
+from os import path
+from re import findall
+from sys import argv
+from csv import writer
+from time import perf_counter
+from getopt import getopt, GetoptError
+from stencil_optimizer import compute_dependencies, compute_sequence, compute_utilization
+from stencil_optimizer import compute_domain, bound_program, generate_lp, solve_lp, parse_lp
+from stencil_optimizer import partition_program
+from stencil_synthetic import define_program, SHAPES
+
+# benchmark configuration
+COUNTS = [4, 8, 16, 32]
+TIMELIMIT = 60
+# optimizer phases in the order of their execution
+PHASES = ["DEPENDENCIES", "SEQUENCE", "UTILIZATION", "PRESOLVE", "GENERATE", "SOLVE", "PARSE"]
+
+def measure_lp(name):
+    """
+    return the number of rows, columns, and nonzeros of the linear program
+    """
+    rows = 0
+    nonzeros = 0
+    columns = set([])
+    section = None
+    with open(name + ".lp") as file:
+        for line in file:
+            if line.strip() in ("Minimize", "Subject To", "General", "Binary", "End"):
+                section = line.strip()
+                continue
+            variables = findall(r"[A-Za-z]\w*%[\w#]*", line)
+            columns.update(variables)
+            # skip the comments of the constraint section
+            if section == "Subject To" and not line.startswith("\\"):
+                rows += 1
+                nonzeros += len(variables)
+    return rows, len(columns), nonzeros
+
+# time the optimizer phases of a single program
+def benchmark_program(name, program):
+    """
+    return the time of every optimizer phase and the size of the linear program
+    """
+    method = program["SOLVER"]["METHOD"]
+    times = {}
+    def measure(phase, function, *arguments):
+        """
+        run the phase and accumulate its time
+        """
+        start = perf_counter()
+        result = function(*arguments)
+        times[phase] = times.get(phase, 0.0) + perf_counter() - start
+        return result
+    measure("DEPENDENCIES", compute_dependencies, program)
+    measure("SEQUENCE", compute_sequence, program)
+    measure("UTILIZATION", compute_utilization, program)
+    measure("PRESOLVE", compute_domain, program)
+    measure("PRESOLVE", bound_program, program)
+    measure("GENERATE", generate_lp, name, program)
+    size = measure_lp(name)
+    # run the heuristic instead of the solver if requested
+    if method == "DP":
+        record = measure("SOLVE", partition_program, program)
+        times["PARSE"] = 0.0
+    else:
+        record = measure("SOLVE", solve_lp, name, program["SOLVER"], False, program["SCALE"])
+        measure("PARSE", parse_lp, name, program)
+    return times, size, record
+
+# benchmark the optimizer for growing programs of all shapes
+def benchmark_scaling(folder, shapes, counts, settings):
+    """
+    benchmark the synthetic programs and write the scaling curves
+    """
+    header = ["SHAPE", "STENCILS", "ROWS", "COLUMNS", "NONZEROS"] + PHASES
+    header += ["STATUS", "EST", "GAP"]
+    with open(folder + "scaling.csv", "w") as file:
+        csv = writer(file, delimiter=",", quotechar="'", lineterminator="\n")
+        csv.writerow(header)
+        for shape in shapes:
+            for count in counts:
+                program = define_program(shape, count, **settings["PROGRAM"])
+                program["SOLVER"]["METHOD"] = settings["METHOD"]
+                program["SOLVER"]["TIMELIMIT"] = settings["TIMELIMIT"]
+                print("-> benchmarking " + program["NAME"])
+                times, size, record = benchmark_program(folder + program["NAME"], program)
+                print(" ==> phases " + ", ".join([x.lower() + " " + "{0:.3f}".format(times[x])
+                                                  for x in PHASES]) + " s")
+                csv.writerow([shape, str(count)] + [str(x) for x in size] +
+                             ["{0:.6f}".format(times[x]) for x in PHASES] +
+                             [str(record["STATUS"]), str(record["OBJECTIVE"]), str(record["GAP"])])
+                file.flush()
+
+# the main program
+def main(arguments):
+    """ main method used to run the benchmark """
+    shapes = SHAPES
+    counts = COUNTS
+    settings = {"PROGRAM" : {}, "METHOD" : "MILP", "TIMELIMIT" : TIMELIMIT}
+    folder = "./"
+    try:
+        short = "s:n:a:r:w:m:t:f:"
+        extended = ["shapes=", "counts=", "fields=", "reads=", "halo=", "method=", "timelimit=",
+                    "folder="]
+        opts, _ = getopt(arguments, short, extended)
+    except GetoptError:
+        print("scaling.py -s <shapes> -n <counts> -f <folder>")
+        exit(2)
+    for opt, arg in opts:
+        if opt in ("-s", "--shapes"):
+            shapes = [x.upper() for x in arg.split(",")]
+        elif opt in ("-n", "--counts"):
+            counts = [int(x) for x in arg.split(",")]
+        elif opt in ("-a", "--fields"):
+            settings["PROGRAM"]["fields"] = int(arg)
+        elif opt in ("-r", "--reads"):
+            settings["PROGRAM"]["reads"] = int(arg)
+        elif opt in ("-w", "--halo"):
+            settings["PROGRAM"]["halo"] = int(arg)
+        elif opt in ("-m", "--method"):
+            settings["METHOD"] = arg.upper()
+        elif opt in ("-t", "--timelimit"):
+            settings["TIMELIMIT"] = int(arg)
+        elif opt in ("-f", "--folder"):
+            folder = path.normpath(arg) + "/"
+    print("-> working dir: " + str(folder))
+    print("-> shapes: " + ", ".join(shapes))
+    print("-> stencil counts: " + ", ".join([str(x) for x in counts]))
+    print("-> method: " + settings["METHOD"])
+    assert settings["METHOD"] in ("MILP", "DP"), "unknown method " + settings["METHOD"]
+    benchmark_scaling(folder, shapes, counts, settings)
+
+if __name__ == "__main__":
+    main(argv[1:])
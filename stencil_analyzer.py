@@ -3,8 +3,17 @@
 """ this module analyzes the stencil program data dependencies """
 
 from re import findall
+from math import gcd
 from itertools import groupby
 
+# default per core cache hierarchy (sizes in bytes)
+CACHES = [
+    {"NAME" : "L1", "SIZE" : 32 * 1024, "WAYS" : 8, "LINE" : 64},
+    {"NAME" : "L2", "SIZE" : 256 * 1024, "WAYS" : 8, "LINE" : 64}
+]
+# default alignment of the array allocations and rows (in bytes)
+ALIGNMENT = 64
+
 def compute_bounds(values):
     """
     return bounding box for list of offsets
@@ -236,6 +245,45 @@ def compute_dataflow(program):
     dataflow = [(group["INPUTS"], group["OUTPUTS"]) for group in program["TILING"]["GROUPS"]]
     analyze_dataflow(program["TILING"], dataflow, set(program["OUTPUTS"]))
 
+# assign the tile temporaries to the slots of the scratch memory
+def compute_scratch(program):
+    """
+    share the scratch slots between the temporaries of a group that are not live at the same time
+    """
+    for group0 in program["TILING"]["GROUPS"]:
+        for group1 in group0["GROUPS"]:
+            names = [stencil["NAME"] for stencil in group1["STENCILS"]]
+            # a temporary is live from its stencil to the last stencil reading it
+            intervals = []
+            for temp in group1["TEMPS"]:
+                first = names.index(temp)
+                last = max([first] + [index for index, stencil in enumerate(group1["STENCILS"])
+                                      if temp in stencil["OFFSETS"]])
+                intervals.append((first, last, temp))
+            # reuse the first slot released before the temporary is written
+            ends = []
+            group1["SLOTS"] = {}
+            for first, last, temp in sorted(intervals):
+                slot = next((x for x, end in enumerate(ends) if end < first), len(ends))
+                if slot == len(ends):
+                    ends.append(last)
+                ends[slot] = last
+                group1["SLOTS"][temp] = slot
+            group1["SCRATCH"] = len(ends)
+
+# select the groups that initialize the arrays
+def compute_touch(program):
+    """
+    assign every array to the first group that reads or writes it
+    """
+    touch = {}
+    for group0 in program["TILING"]["GROUPS"]:
+        for group1 in group0["GROUPS"]:
+            if group1["LOOPS"]:
+                for name in group1["INPUTS"] + group1["OUTPUTS"]:
+                    touch.setdefault(name, group1["ID"])
+    program["TILING"]["TOUCH"] = touch
+
 # verify verify_program
 def verify_program(program):
     """
@@ -257,3 +305,96 @@ def verify_program(program):
             assert xsize1 > 0, "x size not large enough for cache tiling"
             assert ysize1 > 0, "y size not large enough for cache tiling"
             assert zsize1 > 0, "z size not large enough for cache tiling"
+
+# compute the padding of the array layouts
+def compute_padding(machine, size):
+    """
+    return the alignment and the cache way sizes in values of the given size
+    """
+    align = max(1, machine.get("ALIGNMENT", ALIGNMENT) // size)
+    strides = [max(1, x["SIZE"] // x["WAYS"] // size // align)
+               for x in machine.get("CACHES", CACHES)]
+    return {"ALIGN" : align, "STRIDES" : strides}
+
+def pad_extent(extent, unit, count, padding):
+    """
+    return the smallest extent whose first count multiples by the unit map to distinct cache sets
+    """
+    # the pitch in alignment units repeats its cache set after stride / gcd(pitch, stride) steps
+    unit = unit // padding["ALIGN"]
+    conflict = lambda x, y: y // gcd(x, y) < min(count, y // gcd(unit, y))
+    while [x for x in padding["STRIDES"] if conflict(extent * unit, x)]:
+        extent = extent + 1
+    return extent
+
+def compute_layout(sizes, halos, padding):
+    """
+    return the offset, the pitches, and the size of a padded array including the halos
+    """
+    align = padding["ALIGN"]
+    shape = [x + 2 * y for x, y in zip(sizes, halos)]
+    # align the rows and the first value inside the halo
+    offset = (align - halos[0] % align) % align
+    rows = pad_extent((shape[0] + align - 1) // align, align, shape[1], padding) * align
+    planes = pad_extent(shape[1], rows, shape[2], padding) * rows
+    return {"OFFSET" : offset, "PITCH" : (rows, planes), "SIZE" : offset + planes * shape[2]}
+
+def pad_sizes(sizes, halos, padding):
+    """
+    return the domain sizes extended by the padding of the rows and planes
+    """
+    pitch = compute_layout(sizes, halos, padding)["PITCH"]
+    return [pitch[0] - 2 * halos[0], pitch[1] // pitch[0] - 2 * halos[1], sizes[2]]
+
+# compute the padded layouts of the arrays, the subdomain arrays, and the tile temporaries
+def compute_layouts(program, size):
+    """
+    store the alignment, the offset, and the pitches of the array types
+    """
+    padding = compute_padding(program.get("MACHINE", {}), size)
+    sizes = [program["X"], program["Y"], program["Z"]]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    counts = [program["TILING"]["NX"], program["TILING"]["NY"], program["TILING"]["NZ"]]
+    subdomain = [(x + y - 1) // y for x, y in zip(sizes, counts)]
+    layout = compute_layout(sizes, halos, padding)
+    program["TILING"]["LAYOUT"] = {
+        "ALIGN" : padding["ALIGN"], "OFFSET" : layout["OFFSET"], "ARRAY" : layout["PITCH"],
+        "SUBDOMAIN" : compute_layout(subdomain, halos, padding)["PITCH"]
+    }
+    for group0 in program["TILING"]["GROUPS"]:
+        for group1 in group0["GROUPS"]:
+            counts = [group1["NX"], group1["NY"], group1["NZ"]]
+            tiles = [(x + y - 1) // y for x, y in zip(subdomain, counts)]
+            group1["PITCH"] = compute_layout(tiles, halos, padding)["PITCH"]
+
+# compute the tile loops of a single node execution
+def compute_loops(program, group0, group1):
+    """
+    return the tile and stencil loop boundaries relative to the domain (see template_tiling.cpp)
+    """
+    sizes = [program["X"], program["Y"], program["Z"]]
+    counts = [group1["NX"], group1["NY"], group1["NZ"]]
+    tiles = [(x + y - 1) // y for x, y in zip(sizes, counts)]
+    offsets = [-((x * y - z) // 2) for x, y, z in zip(tiles, counts, sizes)]
+    result = []
+    for z in range(counts[2]):
+        for y in range(counts[1]):
+            for x in range(counts[0]):
+                index = [x, y, z]
+                tile = [(index[dim] * tiles[dim] + offsets[dim],
+                         (index[dim] + 1) * tiles[dim] + offsets[dim]) for dim in range(3)]
+                loops = {}
+                for name, bounds1 in group1["LOOPS"].items():
+                    # extend the boundaries of the outer tiles
+                    bounds0 = group0["LOOPS"][name]
+                    loops[name] = []
+                    for dim in range(3):
+                        start = tile[dim][0] + bounds1[dim][0]
+                        stop = tile[dim][1] + bounds1[dim][1]
+                        if index[dim] == 0:
+                            start = min(start, bounds0[dim][0])
+                        if index[dim] == counts[dim] - 1:
+                            stop = max(stop, sizes[dim] + bounds0[dim][1])
+                        loops[name].append((start, stop))
+                result.append((tile, loops))
+    return result
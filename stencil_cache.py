@@ -0,0 +1,168 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module simulates the cache behavior of tiled stencil programs """
+
+from stencil_analyzer import verify_program, compute_dataflow, compute_boundaries
+from stencil_analyzer import parse_stencil, compute_loops, compute_scratch, compute_layouts
+from stencil_analyzer import CACHES
+from stencil_program import derive_program
+from stencil_optimizer import SIZE_OF_VALUE
+
+# tolerated fraction of non-compulsory last level misses
+TOLERANCE = 0.1
+# alignment of the array allocations
+PAGE = 4096
+
+def define_caches(caches):
+    """
+    return empty cache levels with least recently used replacement
+    """
+    levels = []
+    for cache in caches:
+        count = cache["SIZE"] // (cache["WAYS"] * cache["LINE"])
+        levels.append({
+            "NAME" : cache["NAME"], "WAYS" : cache["WAYS"], "LINE" : cache["LINE"],
+            "SETS" : [[] for _ in range(count)], "ACCESSES" : 0, "MISSES" : 0
+        })
+    return levels
+
+def access_caches(levels, address):
+    """
+    access the address and forward the misses to the next level
+    """
+    for level in levels:
+        line = address // level["LINE"]
+        entries = level["SETS"][line % len(level["SETS"])]
+        level["ACCESSES"] = level["ACCESSES"] + 1
+        if line in entries:
+            entries.remove(line)
+            entries.append(line)
+            return
+        level["MISSES"] = level["MISSES"] + 1
+        entries.append(line)
+        if len(entries) > level["WAYS"]:
+            entries.pop(0)
+
+def define_layout(program, group1, tiles):
+    """
+    return the base address and the pitches of all arrays accessed by the group
+    """
+    layout = program["TILING"]["LAYOUT"]
+    shift = layout["OFFSET"] * SIZE_OF_VALUE
+    names = set([])
+    for stencil in group1["STENCILS"]:
+        names = names.union(stencil["OFFSETS"].keys()).union([stencil["NAME"]])
+    result = {}
+    base = 0
+    for name in sorted(names.difference(group1["TEMPS"])):
+        result[name] = (base + shift, layout["ARRAY"])
+        size = shift + layout["ARRAY"][1] * (program["Z"] + 2 * program["HZ"]) * SIZE_OF_VALUE
+        base = base + (size + PAGE - 1) // PAGE * PAGE
+    # the group temporaries share the tile sized slots of the thread scratch memory
+    size = shift + group1["PITCH"][1] * (tiles[2] + 2 * program["HZ"]) * SIZE_OF_VALUE
+    alignment = layout["ALIGN"] * SIZE_OF_VALUE
+    size = (size + alignment - 1) // alignment * alignment
+    for name in group1["TEMPS"]:
+        result[name] = (base + group1["SLOTS"][name] * size + shift, group1["PITCH"])
+    return result
+
+def replay_tile(program, group1, layout, tile, loops, levels):
+    """
+    replay the accesses of a tile row by row and return the touched cache lines
+    """
+    line = levels[0]["LINE"]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    touched = set([])
+    for stencil in group1["STENCILS"]:
+        name = stencil["NAME"]
+        accesses = [(x, sorted(set(y))) for x, y in parse_stencil(stencil["LAMBDA"]).items()]
+        accesses.append((name, [(0, 0, 0)]))
+        box = loops[name]
+        for k in range(box[2][0], box[2][1]):
+            for j in range(box[1][0], box[1][1]):
+                for array, offsets in accesses:
+                    base, pitch = layout[array]
+                    # the temporaries are indexed relative to the tile origin
+                    origin = [x[0] for x in tile] if array in group1["TEMPS"] else [0, 0, 0]
+                    for offset in offsets:
+                        index = [halos[dim] + offset[dim] - origin[dim] for dim in range(3)]
+                        start = (index[0] + box[0][0] + (index[1] + j) * pitch[0] +
+                                 (index[2] + k) * pitch[1]) * SIZE_OF_VALUE + base
+                        stop = start + (box[0][1] - box[0][0]) * SIZE_OF_VALUE
+                        for address in range(start // line * line, stop, line):
+                            access_caches(levels, address)
+                            touched.add(address)
+    return touched
+
+# simulate sampled tiles of all groups
+def simulate_tiling(program, samples=4):
+    """
+    return the simulated cache misses per group and level
+    """
+    program = derive_program(program)
+    verify_program(program)
+    compute_dataflow(program)
+    compute_boundaries(program)
+    compute_scratch(program)
+    compute_layouts(program, SIZE_OF_VALUE)
+    caches = program["MACHINE"].get("CACHES", CACHES)
+    capacity = program["MACHINE"]["CAPACITY"]
+    sizes = [program["X"], program["Y"], program["Z"]]
+    result = {"VARIANT" : program.get("VARIANT", program["NAME"]), "GROUPS" : []}
+    for group0 in program["TILING"]["GROUPS"]:
+        for group1 in group0["GROUPS"]:
+            counts = [group1["NX"], group1["NY"], group1["NZ"]]
+            tiles = [(x + y - 1) // y for x, y in zip(sizes, counts)]
+            layout = define_layout(program, group1, tiles)
+            loops = compute_loops(program, group0, group1)
+            # sample evenly spaced tiles and replay each of them with cold caches
+            selected = loops[::max(1, len(loops) // samples)][:samples]
+            footprint = 0
+            statistics = [{"NAME" : x["NAME"], "ACCESSES" : 0, "MISSES" : 0} for x in caches]
+            for tile, bounds in selected:
+                levels = define_caches(caches)
+                touched = replay_tile(program, group1, layout, tile, bounds, levels)
+                footprint = footprint + len(touched) * levels[0]["LINE"]
+                for level, statistic in zip(levels, statistics):
+                    statistic["ACCESSES"] = statistic["ACCESSES"] + level["ACCESSES"]
+                    statistic["MISSES"] = statistic["MISSES"] + level["MISSES"]
+            # average the statistics over the sampled tiles
+            footprint = footprint // len(selected)
+            for statistic in statistics:
+                statistic["ACCESSES"] = statistic["ACCESSES"] // len(selected)
+                statistic["MISSES"] = statistic["MISSES"] // len(selected)
+            compulsory = footprint // caches[0]["LINE"]
+            overflow = footprint > capacity or \
+                       statistics[-1]["MISSES"] > (1.0 + TOLERANCE) * compulsory
+            result["GROUPS"].append({
+                "STENCILS" : [x["NAME"] for x in group1["STENCILS"]],
+                "TILES" : len(loops),
+                "FOOTPRINT" : footprint,
+                "COMPULSORY" : compulsory,
+                "LEVELS" : statistics,
+                "OVERFLOW" : overflow
+            })
+    result["MISSES"] = sum([x["LEVELS"][-1]["MISSES"] * x["TILES"] for x in result["GROUPS"]])
+    result["OVERFLOW"] = True in [x["OVERFLOW"] for x in result["GROUPS"]]
+    return result
+
+# rank the tilings by their simulated cache misses
+def rank_tilings(experiments, samples=4):
+    """
+    print the variants sorted by the last level misses and flag the overflowing groups
+    """
+    results = [simulate_tiling(x, samples) for _, x in experiments.items()]
+    results = sorted(results, key=lambda x: x["MISSES"])
+    for result in results:
+        print("-> " + result["VARIANT"] + "\t-> misses " + str(result["MISSES"]) +
+              ("\t-> overflow" if result["OVERFLOW"] else ""))
+        for group in result["GROUPS"]:
+            buffer = "   - " + ", ".join(group["STENCILS"])
+            buffer += "\t-> footprint " + str(group["FOOTPRINT"] // 1024) + " kB"
+            for level in group["LEVELS"]:
+                buffer += "\t-> " + level["NAME"] + " " + str(level["MISSES"])
+            buffer += "\t-> compulsory " + str(group["COMPULSORY"])
+            if group["OVERFLOW"]:
+                buffer += "\t-> overflow"
+            print(buffer)
+    return results
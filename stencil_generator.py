@@ -8,6 +8,34 @@ from collections import deque
 from jinja2 import Environment, FileSystemLoader
 from subprocess import call
 from stencil_analyzer import verify_program, compute_dataflow, compute_boundaries
+from stencil_analyzer import compute_scratch, compute_touch, compute_layouts
+from stencil_optimizer import SIZE_OF_VALUE
+from stencil_profiler import profile_phase, measure_phase, select_experiment, count_metric
+from stencil_program import derive_program
+
+# default configuration of the adaptive repetition
+ADAPTIVE = {
+    "WIDTH" : 0.02,  # relative width of the median confidence interval
+    "LEVEL" : 1.96,  # z-value of the 95% confidence level
+    "WINDOW" : 4,    # number of measurements compared to detect the steady state
+    "BUDGET" : 30.0  # time budget per variant in seconds
+}
+# compiled templates per working directory and template name
+TEMPLATES = {}
+# compiler and flags of the generated code
+CC = "g++"
+CCFLAGS = ["-std=c++11", "-O3", "-ffast-math", "-fopenmp", "-DNDEBUG"]
+LDFLAGS = []
+
+def load_template(template):
+    """
+    return the compiled template and keep it for the following variants
+    """
+    key = (getcwd(), template)
+    if key not in TEMPLATES:
+        env = Environment(loader=FileSystemLoader(getcwd()))
+        TEMPLATES[key] = env.get_template(template)
+    return TEMPLATES[key]
 
 # compute the program schedule
 def compute_schedule(program):
@@ -21,13 +49,22 @@ def compute_schedule(program):
     for group in program["TILING"]["GROUPS"]:
         # insert synchronization
         wait = fifo.popleft()
-        if wait:
-            schedule.append(wait)
         # insert computation
         if group["LOOPS"]:
-            schedule.append({"TYPE": "COMP", "GROUP": group})
-        # insert communication
-        if group["HALOS"]:
+            if wait and len(group["GROUPS"]) == 1:
+                # overlap the pending halo update with the interior tiles
+                group["GROUPS"][0]["OVERLAP"] = True
+                schedule.append({"TYPE": "COMP", "GROUP": group, "TILES": "INTERIOR"})
+                schedule.append(wait)
+                schedule.append({"TYPE": "COMP", "GROUP": group, "TILES": "BOUNDARY"})
+            else:
+                if wait:
+                    schedule.append(wait)
+                schedule.append({"TYPE": "COMP", "GROUP": group, "TILES": "ALL"})
+        elif wait:
+            schedule.append(wait)
+        # insert communication (the input halos are updated before the time loop)
+        if group["HALOS"] and group["LOOPS"]:
             put = {"TYPE": "PUT", "GROUP": group}
             schedule.append(put)
             wait = put.copy()
@@ -35,49 +72,62 @@ def compute_schedule(program):
             fifo.append(wait)
         else:
             fifo.append(None)
+    # insert the pending synchronization
+    schedule.extend([wait for wait in fifo if wait])
     program["SCHEDULE"] = schedule
 
 # generate the stencil code
+@profile_phase("GENERATE CODE")
 def generate_code(template, name, program):
     """
     generate the code
     """
+    select_experiment(program.get("VARIANT", program["NAME"]))
+    # keep the derived data of the code generation out of the variant
+    program = derive_program(program)
     # verify the consistency of the configuration
     verify_program(program)
     # compute inputs, outputs and temporaries for all tiling levels
     compute_dataflow(program)
     # compute the boundary information
     compute_boundaries(program)
+    # share the scratch memory between the temporaries of the tiles
+    compute_scratch(program)
+    # pad the array layouts to aligned and conflict free pitches
+    compute_layouts(program, SIZE_OF_VALUE)
+    # initialize the arrays with the tile to thread mapping of their first group
+    compute_touch(program)
     # compute the schedule
     compute_schedule(program)
     # render the template
-    env = Environment(loader=FileSystemLoader(getcwd()))
-    tpl = env.get_template(template)
-    code = tpl.render(program)
+    with measure_phase("TEMPLATE LOADING"):
+        tpl = load_template(template)
+    with measure_phase("RENDERING"):
+        code = tpl.render(program)
+    count_metric("CODE BYTES", len(code))
     # write the code
     with open(name, "w") as file:
         file.write(code)
 
 # generate the makefile
+@profile_phase("MAKEFILE")
 def generate_makefile(name, experiments):
     """
     generate the makefile
     """
+    select_experiment(None)
     # power flags
     #ccflags = ["-O3", "-std=c++11", "-ffast-math",
     #           "-mcpu=power8", "-fopenmp", "-DNDEBUG"]
     # knl flags
     #ccflags = ["-O3", "-std=c++11", "-ffast-math",
     #           "-mavx512f", "-mavx512cd", "-mavx512er", "-mavx512pf", "-DNDEBUG"]
-    ccflags = ["-std=c++11", "-O3", "-ffast-math", "-fopenmp",
-               "-DNDEBUG"]
-    ldflags = []
     # generate the run script
     with open(name, "w", newline="\n") as file:
         file.write("\n")
-        file.write("CC=g++\n")
-        file.write("CCFLAGS= \\\n\t" + " \\\n\t".join(ccflags) + "\n")
-        file.write("LDFLAGS= \\\n\t" + " \\\n\t".join(ldflags) + "\n\n")
+        file.write("CC=" + CC + "\n")
+        file.write("CCFLAGS= \\\n\t" + " \\\n\t".join(CCFLAGS) + "\n")
+        file.write("LDFLAGS= \\\n\t" + " \\\n\t".join(LDFLAGS) + "\n\n")
         file.write("all: " + " ".join(experiments.keys()))
         file.write("\n\n")
         for name, _ in experiments.items():
@@ -89,10 +139,28 @@ def generate_makefile(name, experiments):
         file.write("\trm *.o " + " ".join(experiments.keys()))
 
 # build the program
+@profile_phase("BUILD")
 def build_experiment(name):
     """ build program """
+    select_experiment(None)
     call(["make"])
 
+# compile a single experiment
+@profile_phase("BUILD")
+def compile_experiment(folder, name):
+    """ compile the experiment with the flags of the makefile and return the compiler status """
+    return call([CC] + CCFLAGS + ["-o", name, name + ".cpp"] + LDFLAGS, cwd=folder)
+
+# build and run the experiments
+def run_experiments(folder, script, output):
+    """ build the experiments and write the print outs of a run to the output file """
+    select_experiment(None)
+    with measure_phase("BUILD"):
+        call(["make", "-C", folder])
+    with measure_phase("RUN"):
+        with open(folder + output, "w") as file:
+            call(["bash", script], cwd=folder, stdout=file)
+
 # generate the run script
 def generate_script(name, experiments, cores, runs):
     """ generate the run script """
@@ -105,12 +173,25 @@ def generate_script(name, experiments, cores, runs):
         file.write("export OMP_NUM_THREADS=" + str(cores) + "\n\n")
         file.write("export OMP_STACKSIZE=128M\n\n")
         for run in range(runs):
-            for name, _ in experiments.items():
-                file.write("./" + name + "\n")
+            for name, experiment in experiments.items():
+                # the sweeps read their domain sizes from the standard input
+                if "SIZES" in experiment:
+                    file.write("./" + name + " < " + name + ".sizes\n")
+                else:
+                    file.write("./" + name + "\n")
+
+# write the domain sizes of a sweep
+def generate_sizes(name, sizes):
+    """ write one domain size per line for the runtime sized sweep binaries """
+    with open(name, "w", newline="\n") as file:
+        for size in sizes:
+            file.write(" ".join([str(x) for x in size]) + "\n")
 
 # parse the results
+@profile_phase("PARSE RESULTS")
 def parse_results(results, skip = 16):
     """ convert the print outs of a run to a csv file """
+    select_experiment(None)
     # analyze the results
     domain = []
     variant = None
@@ -128,6 +209,9 @@ def parse_results(results, skip = 16):
             domain = [int(x) for x in line[len("   - domain "):].split(", ")]
             # activate this if you want to skip the first measurements
             counter = skip
+        elif line.startswith("   - runs adaptive"):
+            # the adaptive repetition prints no warm-up measurements
+            counter = 0
         elif line.startswith("   - variant "):
             variant = str(line[len("   - variant "):]).rstrip()
         elif line.startswith("   - total time (min/median/max) [ms]: "):
@@ -0,0 +1,227 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module interprets stencil programs with numpy to verify fusion and tiling plans """
+
+from re import sub
+from numpy import full, where, nan, isnan, absolute, maximum
+from numpy.random import default_rng
+from stencil_analyzer import verify_program, compute_dataflow, compute_boundaries
+from stencil_analyzer import parse_stencil, compute_loops
+from stencil_program import derive_program
+
+# match the array accesses of a stencil lambda
+ACCESS = (r"(\w+)\("                        # match the array name
+          r"\s*i\s*((?:[+-]\s*)+\d+)?\s*,"  # match the i offset
+          r"\s*j\s*((?:[+-]\s*)+\d+)?\s*,"  # match the j offset
+          r"\s*k\s*((?:[+-]\s*)+\d+)?\s*\)")  # match the k offset
+
+def convert_offset(offset):
+    """
+    return the integer value of an access offset
+    """
+    return 0 if not offset else int(offset.replace(" ", "").replace("+-", "-"))
+
+def convert_ternary(expression):
+    """
+    return the expression with the ternary operators replaced by numpy where calls
+    """
+    # convert the parenthesized subexpressions first
+    result = ""
+    depth = 0
+    start = 0
+    for idx, char in enumerate(expression):
+        if char == "(":
+            if depth == 0:
+                result = result + expression[start:idx + 1]
+                start = idx + 1
+            depth = depth + 1
+        elif char == ")":
+            depth = depth - 1
+            if depth == 0:
+                result = result + convert_ternary(expression[start:idx])
+                start = idx
+    result = result + expression[start:]
+    # split the top level ternary operator into condition and branches
+    depth = 0
+    question = None
+    nesting = 0
+    for idx, char in enumerate(result):
+        if char == "(":
+            depth = depth + 1
+        elif char == ")":
+            depth = depth - 1
+        elif char == "?" and depth == 0:
+            if question is None:
+                question = idx
+            else:
+                nesting = nesting + 1
+        elif char == ":" and depth == 0 and question is not None:
+            if nesting == 0:
+                condition = result[:question].strip()
+                first = convert_ternary(result[question + 1:idx].strip())
+                second = convert_ternary(result[idx + 1:].strip())
+                return "where(" + condition + ", " + first + ", " + second + ")"
+            nesting = nesting - 1
+    return result
+
+def translate_stencil(stencil):
+    """
+    return a function that evaluates the stencil lambda on numpy slices
+    """
+    access = lambda x: ("fetch(\"" + x.group(1) + "\", " + str(convert_offset(x.group(2))) +
+                        ", " + str(convert_offset(x.group(3))) +
+                        ", " + str(convert_offset(x.group(4))) + ")")
+    lines = ["def evaluate(fetch):"]
+    for statement in [x.strip() for x in stencil.split(";") if x.strip()]:
+        assert statement.startswith("auto "), "unsupported statement " + statement
+        assert "&&" not in statement and "||" not in statement, "unsupported operator"
+        name, expression = statement[len("auto "):].split("=", 1)
+        expression = sub(ACCESS, access, expression.strip())
+        lines.append("    " + name.strip() + " = " + convert_ternary(expression))
+    lines.append("    return res")
+    scope = {"where" : where}
+    exec("\n".join(lines), scope)
+    return scope["evaluate"]
+
+def define_array(program, origin, size):
+    """
+    return a nan initialized array with the given origin and interior size
+    """
+    halo = [program["HX"], program["HY"], program["HZ"]]
+    shape = tuple(x + 2 * y for x, y in zip(size, halo))
+    return full(shape, nan), tuple(x - y for x, y in zip(origin, halo))
+
+def access_array(array, box, offset):
+    """
+    return the slices of the array that correspond to the shifted box
+    """
+    data, origin = array
+    slices = []
+    for dim in range(3):
+        start = box[dim][0] + offset[dim] - origin[dim]
+        stop = box[dim][1] + offset[dim] - origin[dim]
+        assert start >= 0 and stop <= data.shape[dim], "access out of array bounds"
+        slices.append(slice(start, stop))
+    return tuple(slices)
+
+def apply_stencil(evaluate, name, box, arrays):
+    """
+    apply the stencil to all points of the box
+    """
+    if min([x[1] - x[0] for x in box]) <= 0:
+        return
+    lookup = lambda x: next(y[x] for y in arrays if x in y)
+    fetch = lambda x, i, j, k: lookup(x)[0][access_array(lookup(x), box, (i, j, k))]
+    target = lookup(name)
+    target[0][access_array(target, box, (0, 0, 0))] = evaluate(fetch)
+
+def make_periodic(program, array):
+    """
+    apply the periodic boundary condition to an array of domain size
+    """
+    data = array[0]
+    sizes = [program["X"], program["Y"], program["Z"]]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    for dim, (size, halo) in enumerate(zip(sizes, halos)):
+        if halo == 0:
+            continue
+        index = lambda x, y: tuple(slice(x, y) if z == dim else slice(None) for z in range(3))
+        data[index(0, halo)] = data[index(size, size + halo)]
+        data[index(size + halo, size + 2 * halo)] = data[index(halo, 2 * halo)]
+
+def compute_inputs(program):
+    """
+    return the arrays read but not written by the stencil program
+    """
+    reads = set([])
+    for stencil in program["STENCILS"].values():
+        reads = reads.union(parse_stencil(stencil).keys())
+    return sorted(reads.difference(program["STENCILS"].keys()))
+
+def define_inputs(program, seed=0):
+    """
+    return periodic random input arrays for the stencil program
+    """
+    generator = default_rng(seed)
+    inputs = {}
+    for name in compute_inputs(program):
+        halos = [program["HX"], program["HY"], program["HZ"]]
+        inputs[name] = define_array(program, halos, [program["X"], program["Y"], program["Z"]])
+        inputs[name][0][:] = generator.random(inputs[name][0].shape)
+        make_periodic(program, inputs[name])
+    return inputs
+
+# execute the program sequentially
+def run_reference(program, inputs):
+    """
+    return the outputs of the sequential execution of all stencils
+    """
+    sizes = [program["X"], program["Y"], program["Z"]]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    interior = tuple((x, x + y) for x, y in zip(halos, sizes))
+    arrays = dict([(name, (data.copy(), origin)) for name, (data, origin) in inputs.items()])
+    for name in program.get("SEQUENCE", list(program["STENCILS"].keys())):
+        arrays[name] = define_array(program, halos, sizes)
+        apply_stencil(translate_stencil(program["STENCILS"][name]), name, interior, [arrays])
+        make_periodic(program, arrays[name])
+    return dict([(name, arrays[name]) for name in program["OUTPUTS"]])
+
+# execute the program using the fusion and tiling plan
+def run_tiling(program, inputs):
+    """
+    return the outputs of the tiled execution of the program (see template_tiling.cpp)
+    """
+    program = derive_program(program)
+    tiling = program["TILING"]
+    assert tiling["NX"] == 1 and tiling["NY"] == 1 and tiling["NZ"] == 1, "single node tiling"
+    verify_program(program)
+    compute_dataflow(program)
+    compute_boundaries(program)
+    sizes = [program["X"], program["Y"], program["Z"]]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    # allocate the input and output arrays
+    arrays = dict([(name, (data.copy(), origin)) for name, (data, origin) in inputs.items()])
+    for name in tiling["OUTPUTS"] + tiling["TEMPS"]:
+        arrays[name] = define_array(program, halos, sizes)
+    for group0 in tiling["GROUPS"]:
+        subdomain = dict([(name, define_array(program, halos, sizes)) for name in group0["TEMPS"]])
+        for group1 in group0["GROUPS"]:
+            counts = [group1["NX"], group1["NY"], group1["NZ"]]
+            tiles = [(x + y - 1) // y for x, y in zip(sizes, counts)]
+            stencils = [(x["NAME"], translate_stencil(x["LAMBDA"])) for x in group1["STENCILS"]]
+            for tile, loops in compute_loops(program, group0, group1):
+                local = dict([(name, define_array(program, [x + y[0] for x, y in zip(halos, tile)],
+                                                  tiles))
+                              for name in group1["TEMPS"]])
+                for name, evaluate in stencils:
+                    # skip the padding of the outer tiles that no stencil of the group consumes
+                    bounds = group0["LOOPS"][name]
+                    box = [(x + max(y[0], z[0]), x + min(y[1], w + z[1]))
+                           for x, y, z, w in zip(halos, loops[name], bounds, sizes)]
+                    apply_stencil(evaluate, name, box, [local, subdomain, arrays])
+        # update the halos of the group outputs
+        for name in group0["HALOS"]:
+            make_periodic(program, arrays[name])
+    return dict([(name, arrays[name]) for name in program["OUTPUTS"]])
+
+# compare the tiled execution to the reference
+def verify_tiling(program, seed=0):
+    """
+    return the number of mismatching interior points per output
+    """
+    print("-> verifying " + str(program.get("VARIANT", program["NAME"])))
+    inputs = define_inputs(program, seed)
+    expected = run_reference(program, inputs)
+    actual = run_tiling(program, inputs)
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    sizes = [program["X"], program["Y"], program["Z"]]
+    interior = tuple(slice(x, x + y) for x, y in zip(halos, sizes))
+    errors = {}
+    for name in program["OUTPUTS"]:
+        value1 = expected[name][0][interior]
+        value2 = actual[name][0][interior]
+        diff = absolute(value1 - value2)
+        bound = maximum(absolute(value1), absolute(value2)) * 1e-7
+        errors[name] = int((isnan(value2) | (diff > bound)).sum())
+        print("   - " + name + ": " + str(errors[name]) + " errors")
+    return errors
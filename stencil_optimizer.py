@@ -4,50 +4,95 @@
 
 import sys
 from os import remove
+from re import match, sub
+from json import dump, dumps
 from shutil import copyfile
-from os.path import exists
+from os.path import exists, getsize
 from random import choice
 from subprocess import Popen, PIPE
 from xml.dom.minidom import parse
-from math import log2, floor
+from math import log2, floor, gcd
+from time import perf_counter
 from functools import reduce
-from stencil_analyzer import analyze_stencil, count_fetches
+from concurrent.futures import ThreadPoolExecutor
+from stencil_analyzer import analyze_stencil, count_fetches, compute_padding, pad_sizes
+from stencil_profiler import profile_phase, measure_phase, select_experiment, count_metric
+from stencil_profiler import bind_experiment
+from stencil_program import FrozenDict, freeze
 
 # constants
 SIZE_OF_VALUE = 8
+# maximal number of stencil orders enumerated before switching to local search
+ORDERS = 1000
+# number of pool solutions collected per requested plan (the pool contains duplicate plans)
+POPULATE = 10
+# configuration entries that determine the optimal plan besides the constraints
+PROBLEM = ["STENCILS", "SEQUENCE", "ORDER", "OUTPUTS", "CONSTANTS", "MACHINE", "MEMORY", "CACHE",
+           "OVERLAP", "SLACK", "SOLVER", "COUNTS", "DECOMPOSE", "WINDOW", "X", "Y", "Z", "HX",
+           "HY", "HZ"]
+# default solver settings (None keeps the cplex default)
+SOLVER = {
+    "MIPGAP" : None,     # relative mip gap tolerance
+    "TIMELIMIT" : None,  # time limit in seconds
+    "THREADS" : None,    # number of solver threads
+    "EMPHASIS" : None,   # mip emphasis (0 balanced, 1 feasibility, 2 optimality, 3 bound)
+    "NODELIMIT" : None,  # maximal number of branch and bound nodes
+    "POOL" : None,       # number of distinct plans collected in the solution pool
+    "POOLGAP" : None,    # relative objective gap of the pool plans
+    "METHOD" : "MILP"    # MILP solves the linear program, DP runs the dynamic programming
+                         # heuristic, and WARM solves the linear program starting from DP
+}
+# access offsets and fetch counts of the analyzed stencil codes
+ANALYSES = {}
 
+@profile_phase("DEPENDENCIES")
 def compute_dependencies(program):
     """
     compute the stencil dependencies
     """
-    stencils = program["STENCILS"]
-    # analyze the dependencies
-    dependencies = dict([(name, analyze_stencil(stencil)) for name, stencil in stencils.items()])
-    fetches = dict([(name, count_fetches(stencil)) for name, stencil in stencils.items()])
+    stencils = freeze(program["STENCILS"])
+    # analyze the stencil codes that have not been analyzed before
+    for stencil in stencils.values():
+        if stencil not in ANALYSES:
+            ANALYSES[stencil] = (freeze(analyze_stencil(stencil)), count_fetches(stencil))
+    # share the immutable analysis with all variants of the stencils
+    dependencies = FrozenDict([(name, ANALYSES[stencil][0]) for name, stencil in stencils.items()])
+    fetches = FrozenDict([(name, ANALYSES[stencil][1]) for name, stencil in stencils.items()])
     # store the results
+    program["STENCILS"] = stencils
     program["DEPENDENCIES"] = dependencies
     program["FETCHES"] = fetches
 
-def compute_sequence(program):
+def sample_sequence(program):
     """
     compute random stencil sequence
     """
     stencils = [name for name, _ in program["STENCILS"].items()]
+    sequence = []
+    while len(sequence) < len(program["STENCILS"]):
+        candidates = []
+        # compute candidate list
+        for stencil in stencils:
+            if stencil not in sequence:
+                inputs = [name for name, _ in program["DEPENDENCIES"][stencil].items()]
+                active = [x for x in inputs if (x in stencils) and (x not in sequence)]
+                if not active:
+                    candidates.append(stencil)
+        # select random candidate element
+        sequence.append(choice(candidates))
+    return sequence
+
+@profile_phase("SEQUENCE")
+def compute_sequence(program):
+    """
+    compute random stencil sequence or search the sequence with the cheapest fusion and tiling
+    """
+    stencils = [name for name, _ in program["STENCILS"].items()]
     dependencies = program["DEPENDENCIES"]
-    if "SEQUENCE" not in program:
-        sequence = []
-        while len(sequence) < len(program["STENCILS"]):
-            candidates = []
-            # compute candidate list
-            for stencil in stencils:
-                if stencil not in sequence:
-                    inputs = [name for name, _ in program["DEPENDENCIES"][stencil].items()]
-                    active = [x for x in inputs if (x in stencils) and (x not in sequence)]
-                    if not active:
-                        candidates.append(stencil)
-            # select random candidate element
-            sequence.append(choice(candidates))
-        program["SEQUENCE"] = sequence
+    if program.get("ORDER", "RANDOM") == "SEARCH":
+        program["SEQUENCE"] = search_sequence(program)
+    elif "SEQUENCE" not in program:
+        program["SEQUENCE"] = sample_sequence(program)
     # verify the sequence
     sequence = program["SEQUENCE"]
     assert len(sequence) == len(stencils), "sequence and stencil size differ"
@@ -58,6 +103,7 @@ def compute_sequence(program):
                 assert index > sequence.index(dependency), "sequence violates dependency"
     print("-> optimizing sequence " + str(program["SEQUENCE"]))
 
+@profile_phase("UTILIZATION")
 def compute_utilization(program):
     """
     compute the maximal cache utilization for the entire group
@@ -73,16 +119,219 @@ def compute_utilization(program):
         for low in range(high + 1):
             utilization[stencil].append(len(reduce(set.union, accesses[low:high + 1])))
     # store the result
-    program["UTILIZATION"] = utilization
+    program["UTILIZATION"] = freeze(utilization)
 
+def compute_candidates(program):
+    """
+    compute the tile count candidates (divisors of the extent or multiples of the cores)
+    """
+    cores = program["MACHINE"]["CORES"]
+    slack = program["SLACK"]
+    candidates = []
+    for size in [program["X"], program["Y"], program["Z"]]:
+        counts = [x for x in range(1, size + 1) if size % x == 0 or x % cores == 0]
+        # drop the multiples of the cores that pad the domain beyond the size slack
+        candidates.append([x for x in counts
+                           if (1.0 - slack["SIZE"]) * ((size + x - 1) // x) * x <= size])
+    return candidates
+
+@profile_phase("DOMAIN")
 def compute_domain(program):
     """
     compute an extended compute domain that is divisible by the number of cores
     """
+    # select the tile counts from the candidate sets using one-hot digits
+    if program.get("COUNTS", "BINARY") == "CANDIDATES":
+        candidates = compute_candidates(program)
+        program["DX"] = list(enumerate(candidates[0]))
+        program["DY"] = list(enumerate(candidates[1]))
+        program["DZ"] = list(enumerate(candidates[2]))
+        return
     # compute the number of digits necessary to represent the number of tiles along all dimensions
-    program["DX"] = range(max(1, floor(log2(program["X"])) + 1))
-    program["DY"] = range(max(1, floor(log2(program["Y"])) + 1))
-    program["DZ"] = range(max(1, floor(log2(program["Z"])) + 1))
+    program["DX"] = [(x, 2**x) for x in range(max(1, floor(log2(program["X"])) + 1))]
+    program["DY"] = [(x, 2**x) for x in range(max(1, floor(log2(program["Y"])) + 1))]
+    program["DZ"] = [(x, 2**x) for x in range(max(1, floor(log2(program["Z"])) + 1))]
+
+def compute_pairs(sequence, outputs, dependencies):
+    """
+    compute the stencil pairs whose group flags appear in the constraints
+    """
+    pairs = set([])
+    for index, stencil in enumerate(sequence):
+        for name in dependencies[stencil].keys():
+            # the producer of the input (access boundaries)
+            if name in sequence:
+                pairs.add((sequence.index(name), index))
+            # the last access (memory cost) and the last read (boundary reads) of the input
+            accesses = [x for x in sequence[:index] if x == name or name in dependencies[x].keys()]
+            reads = [x for x in accesses if name in dependencies[x].keys()]
+            for last in [x[-1] for x in [accesses, reads] if x]:
+                pairs.add((sequence.index(last), index))
+        # the last consumer of the output (memory cost)
+        if stencil not in outputs:
+            last = next((x for x in reversed(sequence[index + 1:])
+                         if stencil in dependencies[x].keys()))
+            pairs.add((index, sequence.index(last)))
+    return sorted(pairs)
+
+def pad_domain(program):
+    """
+    return the domain sizes extended by the padding of the array layout
+    """
+    sizes = [program["X"], program["Y"], program["Z"]]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    return pad_sizes(sizes, halos, compute_padding(program["MACHINE"], SIZE_OF_VALUE))
+
+def presolve_program(program):
+    """
+    drop the unused group flags and fix the variables determined by the constraints
+    """
+    sequence = program["SEQUENCE"]
+    constraints = program["CONSTRAINTS"]
+    cores = program["MACHINE"]["CORES"]
+    capacity = program["MACHINE"]["CAPACITY"]
+    volume = reduce(lambda x, y: x * y, pad_domain(program))
+    onehot = program.get("COUNTS", "BINARY") == "CANDIDATES"
+    # propagate the group index bounds of the fixed groups along the monotone sequence
+    groups = dict([(sequence.index(x), y) for x, y in constraints.get("GROUPS", [])])
+    lower = [0] * len(sequence)
+    upper = [0] * len(sequence)
+    for index in range(1, len(sequence)):
+        lower[index] = max(lower[index - 1], groups.get(index, lower[index - 1]))
+        upper[index] = min(upper[index - 1] + 1, groups.get(index, upper[index - 1] + 1))
+    for index in reversed(range(len(sequence) - 1)):
+        upper[index] = min(upper[index], upper[index + 1])
+        lower[index] = max(lower[index], lower[index + 1] - 1)
+    fixed = [("g%" + str(x), lower[x]) for x in range(1, len(sequence))
+             if lower[x] == upper[x] and x not in groups]
+    # fix the flags of the pairs that are in different groups or in the same fixed group
+    pairs = {}
+    for low, high in compute_pairs(sequence, program["OUTPUTS"], program["DEPENDENCIES"]):
+        pairs[(low, high)] = None
+        if upper[low] < lower[high]:
+            pairs[(low, high)] = 1
+        elif lower[low] == upper[low] == lower[high] == upper[high]:
+            pairs[(low, high)] = 0
+        if pairs[(low, high)] is not None:
+            fixed.append(("g%" + str(low) + "#" + str(high), pairs[(low, high)]))
+    # fix the stores and the read or write flags of the outputs and the stencils stored anyway
+    for index, stencil in enumerate(sequence):
+        if stencil in program["OUTPUTS"]:
+            fixed.append(("rw%" + str(index), 1))
+            continue
+        last = next((x for x in reversed(sequence[index + 1:])
+                     if stencil in program["DEPENDENCIES"][x].keys()))
+        if pairs[(index, sequence.index(last))] == 1:
+            fixed.append(("w%" + str(index), 1))
+            fixed.append(("rw%" + str(index), 1))
+    # bound the tile counts using the tiling, core, and capacity constraints
+    counts = [compute_counts(program, [x]) for x in sequence]
+    for index, stencil in enumerate(sequence):
+        total = max(cores, -(-volume * program["UTILIZATION"][stencil][index] //
+                             (capacity // SIZE_OF_VALUE)))
+        limits = [max(x + [1]) for x in counts[index]]
+        for dim in range(3):
+            others = limits[:dim] + limits[dim + 1:]
+            counts[index][dim] = [x for x in counts[index][dim]
+                                  if x * others[0] * others[1] >= total]
+    # intersect the tile counts of the stencils in the same fixed group
+    for low in range(len(sequence)):
+        for high in range(low + 1, len(sequence)):
+            if lower[low] == upper[low] == lower[high] == upper[high]:
+                for dim in range(3):
+                    common = [x for x in counts[low][dim] if x in counts[high][dim]]
+                    counts[low][dim] = common
+                    counts[high][dim] = common
+    # fix the digits that take the same value for all feasible tile counts
+    digits = {}
+    for index, _ in enumerate(sequence):
+        for dim, dimension in enumerate(["x", "y", "z"]):
+            if not counts[index][dim]:
+                continue
+            for digit, weight in program["D" + dimension.upper()]:
+                values = set([int(x == weight) if onehot else (x // weight) % 2
+                              for x in counts[index][dim]])
+                if len(values) == 1:
+                    digits[(dimension, index, digit)] = values.pop()
+    # drop the digits that are zero for all stencils
+    dropped = 0
+    for dimension in ["x", "y", "z"]:
+        key = "D" + dimension.upper()
+        unused = [x for x, _ in program[key]
+                  if [digits.get((dimension, y, x), None) for y in range(len(sequence))] ==
+                  [0] * len(sequence)]
+        if len(unused) < len(program[key]):
+            program[key] = [x for x in program[key] if x[0] not in unused]
+            dropped = dropped + len(unused) * len(sequence)
+            for index in range(len(sequence)):
+                for digit in unused:
+                    del digits[(dimension, index, digit)]
+    fixed += [("n%" + x + str(y) + "_" + str(z), w) for (x, y, z), w in sorted(digits.items())]
+    # store the result
+    program["PAIRS"] = pairs
+    program["FIXED"] = fixed
+    program["BOUNDS"] = {"GROUPS" : list(zip(lower, upper)), "COUNTS" : counts}
+    print("-> presolve dropped " + str(len(sequence) * (len(sequence) - 1) // 2 - len(pairs)) +
+          " group flags and " + str(dropped) + " digits and fixed " + str(len(fixed)) +
+          " variables")
+
+def compute_limits(program):
+    """
+    compute the tightest big-M constants from the group, tile count, and extent bounds
+    """
+    sequence = program["SEQUENCE"]
+    dependencies = program["DEPENDENCIES"]
+    sizes = [program["X"], program["Y"], program["Z"]]
+    bounds = program["BOUNDS"]
+    # bound the evaluation extents by fusing all consumers of a stencil
+    extents = [[0] * 6 for _ in sequence]
+    for index in reversed(range(len(sequence))):
+        for name, offsets in dependencies[sequence[index]].items():
+            if name in sequence:
+                producer = sequence.index(name)
+                extents[producer] = [max(x, y + abs(offsets[z // 2][z % 2])) for x, y, z in
+                                     zip(extents[producer], extents[index], range(6))]
+    # bound the access extents (at least the extents of the previous read) and the boundary reads
+    accesses = []
+    for index, stencil in enumerate(sequence):
+        accesses.append({})
+        for name, offsets in dependencies[stencil].items():
+            widths = [x + abs(offsets[y // 2][y % 2]) for x, y in zip(extents[index], range(6))]
+            last = next((x for x in reversed(range(index)) if name in accesses[x]), None)
+            if last is not None:
+                widths = [max(x, y) for x, y in zip(widths, accesses[last][name])]
+            accesses[index][name] = widths
+    reads = [[sum([x[2 * y] + x[2 * y + 1] for x in z.values()]) for y in range(3)]
+             for z in accesses]
+    # bound the tile counts and sizes (all counts are feasible if the presolve found none)
+    counts = [[x if x else list(range(1, y + 1)) for x, y in zip(z, sizes)]
+              for z in bounds["COUNTS"]]
+    program["LIMITS"] = {
+        "GROUPS" : bounds["GROUPS"],
+        "COUNTS" : [[max(x) for x in y] for y in counts],
+        "SIZES" : [[-(-x // min(y)) for x, y in zip(sizes, z)] for z in counts],
+        "EXTENTS" : extents,
+        "ACCESSES" : accesses,
+        "READS" : reads
+    }
+
+def compute_scale(program):
+    """
+    compute a power of two that centers the magnitudes of the time coefficients around one
+    """
+    sizes = [program["X"], program["Y"], program["Z"]]
+    volume = sizes[0] * sizes[1] * sizes[2]
+    planes = [sizes[0] * sizes[1], sizes[0] * sizes[2], sizes[1] * sizes[2]]
+    parameters = [program["MEMORY"]["RW BODY"], program["MEMORY"]["ST BODY"]]
+    parameters += [x * program["CACHE"]["BODY"] for x in program["FETCHES"].values()]
+    coefficients = [x * y for x in parameters for y in planes + [volume]]
+    parameters = [program["MEMORY"]["RW PEEL"], program["MEMORY"]["ST PEEL"]]
+    parameters += [x * program["CACHE"]["PEEL"] for x in program["FETCHES"].values()]
+    coefficients += [x * y for x in parameters for y in sizes[1:] + [planes[2]]]
+    coefficients = [abs(x) for x in coefficients if x != 0]
+    if not coefficients:
+        return 1.0
+    return 2.0**round(-log2(min(coefficients) * max(coefficients)) / 2)
 
 def define_target(program):
     """
@@ -92,11 +341,11 @@ def define_target(program):
     sequence = program["SEQUENCE"]
     # define the optimization function as sum of the group time and their startup cost
     print("Minimize")
-    memory = 6 * (program["MEMORY"]["RW BODY"] + program["MEMORY"]["ST BODY"])
+    memory = 6 * (program["MEMORY"]["RW BODY"] + program["MEMORY"]["ST BODY"]) * program["SCALE"]
     print(" + ".join(["t%" + str(index) for index, _ in enumerate(sequence)]) + " + " +
           " + ".join([str(memory) + " n%xyz" + str(index) for index, _ in enumerate(sequence)]))
 
-def compute_groups(sequence):
+def compute_groups(sequence, pairs, limits):
     """
     compute group index and flags
     """
@@ -108,11 +357,10 @@ def compute_groups(sequence):
         print("g%" + str(index) + " - g%" + str(index - 1) + " <= 1")
         print("g%" + str(index) + " - g%" + str(index - 1) + " >= 0")
     # flags forced to one if the group indexes are not equal
-    for high, _ in enumerate(sequence):
-        for low in range(high):
-            limit = len(sequence)
-            print(str(-limit) + " g%" + str(low) + "#" + str(high) + " + " +
-                  "g%" + str(high) + " - " + "g%" + str(low) + " <= 0")
+    for low, high in sorted(pairs.keys()):
+        limit = max(1, limits["GROUPS"][high][1] - limits["GROUPS"][low][0])
+        print(str(-limit) + " g%" + str(low) + "#" + str(high) + " + " +
+              "g%" + str(high) + " - " + "g%" + str(low) + " <= 0")
 
 def compute_memory(sequence, outputs, dependencies):
     """
@@ -154,30 +402,33 @@ def compute_memory(sequence, outputs, dependencies):
         # set the number of streams
         print("s%" + str(index) + " - r%" + str(index) + " - w%" + str(index) + " >= 0")
 
-def compute_boundaries(sequence, dependencies, halos):
+def compute_boundaries(sequence, dependencies, limits):
     """
     compute the evaluation and access boundaries
     """
+    directions = ["xm", "xp", "ym", "yp", "zm", "zp"]
+    extents = limits["EXTENTS"]
     # constrain the evaluation domain
-    def constrain_evaluation(index, access, direction, offset, halo):
+    def constrain_evaluation(index, access, direction, offset):
         """
         compute the evaluation domain
         """
+        limit = extents[index][directions.index(direction)] + abs(offset)
         print("e%" + direction + str(access) + " - e%" + direction + str(index) + " + " +
-              str(halo) + " g%" + str(index) + " - " + str(halo) + " g%" + str(access) + " >= " +
-              str(abs(offset)))
+              str(limit) + " g%" + str(index) + " - " + str(limit) + " g%" + str(access) +
+              " >= " + str(abs(offset)))
     print(r"\ compute the evaluation domains")
     for stencil, accesses in dependencies.items():
         for (name, offsets) in accesses.items():
             if name in sequence:
                 index = sequence.index(stencil)
                 access = sequence.index(name)
-                constrain_evaluation(index, access, "xm", offsets[0][0], halos[0])
-                constrain_evaluation(index, access, "xp", offsets[0][1], halos[0])
-                constrain_evaluation(index, access, "ym", offsets[1][0], halos[1])
-                constrain_evaluation(index, access, "yp", offsets[1][1], halos[1])
-                constrain_evaluation(index, access, "zm", offsets[2][0], halos[2])
-                constrain_evaluation(index, access, "zp", offsets[2][1], halos[2])
+                constrain_evaluation(index, access, "xm", offsets[0][0])
+                constrain_evaluation(index, access, "xp", offsets[0][1])
+                constrain_evaluation(index, access, "ym", offsets[1][0])
+                constrain_evaluation(index, access, "yp", offsets[1][1])
+                constrain_evaluation(index, access, "zm", offsets[2][0])
+                constrain_evaluation(index, access, "zp", offsets[2][1])
     # compute the evaluation boundary
     def sum_evaluation(index, dimension):
         """
@@ -191,16 +442,17 @@ def compute_boundaries(sequence, dependencies, halos):
         sum_evaluation(index, "y")
         sum_evaluation(index, "z")
     # constrain the access boundaries
-    def constrain_access(index, name, direction, offset, halo):
+    def constrain_access(index, name, direction, offset):
         """
         count the boundary accesses
         """
         # do not consider access of temporaries produced within the group
         if name in sequence:
+            limit = limits["ACCESSES"][index][name][directions.index(direction)]
             print("a%" + direction + str(index) + "_" + name + " - " +
                   "e%" + direction + str(index) + " - " +
-                  str(halo) + " g%" + str(sequence.index(name)) + "#" + str(index) +
-                  " >= " + str(abs(offset) - halo))
+                  str(limit) + " g%" + str(sequence.index(name)) + "#" + str(index) +
+                  " >= " + str(abs(offset) - limit))
         else:
             print("a%" + direction + str(index) + "_" + name + " - " +
                   "e%" + direction + str(index) +
@@ -209,19 +461,20 @@ def compute_boundaries(sequence, dependencies, halos):
     for stencil, accesses in dependencies.items():
         for name, offsets in accesses.items():
             index = sequence.index(stencil)
-            constrain_access(index, name, "xm", offsets[0][0], halos[0])
-            constrain_access(index, name, "xp", offsets[0][1], halos[0])
-            constrain_access(index, name, "ym", offsets[1][0], halos[1])
-            constrain_access(index, name, "yp", offsets[1][1], halos[1])
-            constrain_access(index, name, "zm", offsets[2][0], halos[2])
-            constrain_access(index, name, "zp", offsets[2][1], halos[2])
+            constrain_access(index, name, "xm", offsets[0][0])
+            constrain_access(index, name, "xp", offsets[0][1])
+            constrain_access(index, name, "ym", offsets[1][0])
+            constrain_access(index, name, "yp", offsets[1][1])
+            constrain_access(index, name, "zm", offsets[2][0])
+            constrain_access(index, name, "zp", offsets[2][1])
     # compute the boundary reads
-    def constrain_reads(stencil, index, direction, halo):
+    def constrain_reads(stencil, index, direction):
         """
         constrain the boundary reads
         """
         # compute the boundary loads
         for name in dependencies[stencil].keys():
+            limit = limits["ACCESSES"][index][name][directions.index(direction)]
             # compute the memory operations
             try:
                 last = sequence.index(next((x for x in reversed(sequence[:index])
@@ -236,25 +489,26 @@ def compute_boundaries(sequence, dependencies, halos):
                 # fill the entire cache if the predecessor is not in the group
                 print("r%" + direction + str(index) + "_" + name + " - " +
                       "a%" + direction + str(index) + "_" + name + " - " +
-                      str(halo) + " g%" + str(last) + "#" + str(index) + " >= " + str(-halo))
+                      str(limit) + " g%" + str(last) + "#" + str(index) + " >= " + str(-limit))
                 # fill the difference with respect to the predecessor of the same group
+                other = limits["ACCESSES"][last][name][directions.index(direction)]
                 print("a%" + direction + str(index) + "_" + name + " - " +
                       "a%" + direction + str(last) + "_" + name + " + " +
-                      str(halo) + " g%" + str(index) + " - " +
-                      str(halo) + " g%" + str(last) + " >= 0")
+                      str(other) + " g%" + str(index) + " - " +
+                      str(other) + " g%" + str(last) + " >= 0")
                 print("r%" + direction + str(index) + "_" + name + " - " +
                       "a%" + direction + str(index) + "_" + name + " + " +
                       "a%" + direction + str(last) + "_" + name + " + " +
-                      str(halo) + " g%" + str(index) + " - " +
-                      str(halo) + " g%" + str(last) + " >= 0")
+                      str(limit) + " g%" + str(index) + " - " +
+                      str(limit) + " g%" + str(last) + " >= 0")
     print(r"\ compute the boundary accesses")
     for index, stencil in enumerate(sequence):
-        constrain_reads(stencil, index, "xm", halos[0])
-        constrain_reads(stencil, index, "xp", halos[0])
-        constrain_reads(stencil, index, "ym", halos[1])
-        constrain_reads(stencil, index, "yp", halos[1])
-        constrain_reads(stencil, index, "zm", halos[2])
-        constrain_reads(stencil, index, "zp", halos[2])
+        constrain_reads(stencil, index, "xm")
+        constrain_reads(stencil, index, "xp")
+        constrain_reads(stencil, index, "ym")
+        constrain_reads(stencil, index, "yp")
+        constrain_reads(stencil, index, "zm")
+        constrain_reads(stencil, index, "zp")
     # sum the boundary reads
     def sum_reads(stencil, index, dimension):
         """
@@ -270,23 +524,36 @@ def compute_boundaries(sequence, dependencies, halos):
         sum_reads(stencil, index, "y")
         sum_reads(stencil, index, "z")
 
-def compute_tiles(sequence, cores, sizes, digits, slack):
+def compute_tiles(sequence, cores, sizes, digits, slack, limits, onehot=False):
     """
     constrain the tile sizes
     """
-    # compute the number of tiles given the binary representation
+    # compute the number of tiles given the binary or one-hot representation
     def sum_count(dimension, index, digits):
         """
         sum the number of tiles
         """
         prefix = "n%" + dimension + str(index)
-        terms = " - ".join([str(2**x) + " " + prefix + "_" + str(x) for x in digits])
+        terms = " - ".join([str(y) + " " + prefix + "_" + str(x) for x, y in digits])
         print(prefix + " - " + terms + " = 0")
     print(r"\ constrain the tile count per dimension")
     for index, _ in enumerate(sequence):
         sum_count("x", index, digits[0])
         sum_count("y", index, digits[1])
         sum_count("z", index, digits[2])
+    # select exactly one candidate per dimension
+    def select_count(dimension, index, digits):
+        """
+        select one tile count candidate
+        """
+        prefix = "n%" + dimension + str(index)
+        print(" + ".join([prefix + "_" + str(x) for x, _ in digits]) + " = 1")
+    if onehot:
+        print(r"\ select one tile count candidate per dimension")
+        for index, _ in enumerate(sequence):
+            select_count("x", index, digits[0])
+            select_count("y", index, digits[1])
+            select_count("z", index, digits[2])
     # make sure we have at least one tile and at most size tiles
     def constrain_count(dimension, index, size):
         """
@@ -303,7 +570,7 @@ def compute_tiles(sequence, cores, sizes, digits, slack):
         """
         multiply the tile counts
         """
-        for digit in digits:
+        for digit, _ in digits:
             res = "n%" + result + dimension + str(index) + "_" + str(digit)
             val = "n%" + result + str(index)
             mul = "n%" + dimension + str(index) + "_" + str(digit)
@@ -312,8 +579,9 @@ def compute_tiles(sequence, cores, sizes, digits, slack):
             print(res + " - " + val + " - " + str(limit) + " " + mul + " >= " + str(-limit))
     print(r"\ compute the total tile count")
     for index, _ in enumerate(sequence):
-        multiply_counts("x", "y", index, digits[1], sizes[0])
-        multiply_counts("xy", "z", index, digits[2], sizes[0] * sizes[1])
+        counts = limits["COUNTS"][index]
+        multiply_counts("x", "y", index, digits[1], counts[0])
+        multiply_counts("xy", "z", index, digits[2], counts[0] * counts[1])
         sum_count("xy", index, digits[1])
         sum_count("xyz", index, digits[2])
     # multiply the tile sizes with the number of tiles to get the domain size
@@ -321,7 +589,7 @@ def compute_tiles(sequence, cores, sizes, digits, slack):
         """
         multiply the tile size
         """
-        for digit in digits:
+        for digit, _ in digits:
             res = "d%" + dimension + str(index) + "_" + str(digit)
             val = "y%" + dimension + str(index)
             mul = "n%" + dimension + str(index) + "_" + str(digit)
@@ -333,13 +601,13 @@ def compute_tiles(sequence, cores, sizes, digits, slack):
         sum the domain sizes
         """
         prefix = "d%" + dimension + str(index)
-        terms = " - ".join([str(2**x) + " " + prefix + "_" + str(x) for x in digits])
+        terms = " - ".join([str(y) + " " + prefix + "_" + str(x) for x, y in digits])
         print(prefix + " - " + terms + " = 0")
     print(r"\ compute the domain sizes as the product of tile count and size")
     for index, _ in enumerate(sequence):
-        multiply_sizes("x", index, digits[0], sizes[0])
-        multiply_sizes("y", index, digits[1], sizes[1])
-        multiply_sizes("z", index, digits[2], sizes[2])
+        multiply_sizes("x", index, digits[0], limits["SIZES"][index][0])
+        multiply_sizes("y", index, digits[1], limits["SIZES"][index][1])
+        multiply_sizes("z", index, digits[2], limits["SIZES"][index][2])
         sum_sizes("x", index, digits[0])
         sum_sizes("y", index, digits[1])
         sum_sizes("z", index, digits[2])
@@ -370,7 +638,7 @@ def compute_tiles(sequence, cores, sizes, digits, slack):
         """
         enforce tile count equality
         """
-        for digit in digits:
+        for digit, _ in digits:
             print("n%" + dimension + str(high) + "_" + str(digit) + " - " +
                   "n%" + dimension + str(low) + "_" + str(digit) + " + " +
                   "g%" + str(high) + " - g%" + str(low) + " >= 0")
@@ -400,25 +668,26 @@ def compute_footprint(sequence, utilization):
 
 def constrain_footprint(sequence, sizes, capacity):
     """
-    constrain the cache footprint
+    constrain the cache footprint of the padded arrays
     """
-    # compute the cache utilization per group
+    # compute the cache utilization per group (scaled by the common divisor of the coefficients)
     print(r"\ constrain the cache footprint of the individual stencils")
+    volume = sizes[0] * sizes[1] * sizes[2]
+    divisor = gcd(capacity // SIZE_OF_VALUE, volume)
     for index, _ in enumerate(sequence):
-        print(str(capacity // SIZE_OF_VALUE) + " n%xyz" + str(index) + " - " +
-              str(sizes[0] * sizes[1] * sizes[2]) + " f%" + str(index) + " >= 0")
+        print(str(capacity // SIZE_OF_VALUE // divisor) + " n%xyz" + str(index) + " - " +
+              str(volume // divisor) + " f%" + str(index) + " >= 0")
 
-def compute_planes(sequence, dependencies, digits, halos, sizes):
+def compute_planes(sequence, digits, limits):
     """
     compute the number of boundary planes
     """
     # multiply the number of boundary operations with the number of tiles
-    def multiply_boundaries(variable, dimension, index, digits, halo, limit):
+    def multiply_boundaries(variable, dimension, index, digits, limit):
         """
         multiply the tile counts
         """
-        limit = 2 * halo * limit
-        for digit in digits:
+        for digit, _ in digits:
             res = variable + "%n" + dimension + str(index) + "_" + str(digit)
             val = variable + "%" + dimension + str(index)
             mul = "n%" + dimension + str(index) + "_" + str(digit)
@@ -430,50 +699,53 @@ def compute_planes(sequence, dependencies, digits, halos, sizes):
         sum the number of tiles
         """
         prefix = variable + "%n" + dimension + str(index)
-        terms = " - ".join([str(2**x) + " " + prefix + "_" + str(x) for x in digits])
+        terms = " - ".join([str(y) + " " + prefix + "_" + str(x) for x, y in digits])
         print(prefix + " - " + terms + " = 0")
     # compute the number of boundary cache and memory accesses
     print(r"\ multiply the boundary cost by the number of planes")
-    for index, stencil in enumerate(sequence):
-        limit = len(dependencies[stencil])
-        multiply_boundaries("r", "x", index, digits[0], halos[0], limit)
-        multiply_boundaries("r", "y", index, digits[1], halos[1], limit)
-        multiply_boundaries("r", "z", index, digits[2], halos[2], limit)
+    for index, _ in enumerate(sequence):
+        reads = limits["READS"][index]
+        multiply_boundaries("r", "x", index, digits[0], reads[0])
+        multiply_boundaries("r", "y", index, digits[1], reads[1])
+        multiply_boundaries("r", "z", index, digits[2], reads[2])
         sum_boundaries("r", "x", index, digits[0])
         sum_boundaries("r", "y", index, digits[1])
         sum_boundaries("r", "z", index, digits[2])
-    for index, stencil in enumerate(sequence):
-        limit = 1
-        multiply_boundaries("e", "x", index, digits[0], halos[0], limit)
-        multiply_boundaries("e", "y", index, digits[1], halos[1], limit)
-        multiply_boundaries("e", "z", index, digits[2], halos[2], limit)
+    # bound the evaluation boundary per dimension by the extents of the fused consumers
+    extents = [[x[0] + x[1], x[2] + x[3], x[4] + x[5]] for x in limits["EXTENTS"]]
+    for index, _ in enumerate(sequence):
+        multiply_boundaries("e", "x", index, digits[0], extents[index][0])
+        multiply_boundaries("e", "y", index, digits[1], extents[index][1])
+        multiply_boundaries("e", "z", index, digits[2], extents[index][2])
         sum_boundaries("e", "x", index, digits[0])
         sum_boundaries("e", "y", index, digits[1])
         sum_boundaries("e", "z", index, digits[2])
     # compute the total number of read and write boundary lines
-    def constrain_base(index, dimension, halo, size):
+    def constrain_base(index, dimension, limit):
         """
         set the read write boundary width
         """
         print("rw%n" + dimension +  str(index) + " - " +
               "e%n" + dimension + str(index) + " - " +
-              str(2 * halo * size) + " rw%" + str(index) + " >= " + str(-2 * halo * size))
-    for index, stencil in enumerate(sequence):
-        constrain_base(index, "x", halos[0], sizes[0])
-        constrain_base(index, "y", halos[1], sizes[1])
-        constrain_base(index, "z", halos[2], sizes[2])
+              str(limit) + " rw%" + str(index) + " >= " + str(-limit))
+    for index, _ in enumerate(sequence):
+        counts = limits["COUNTS"][index]
+        constrain_base(index, "x", extents[index][0] * counts[0])
+        constrain_base(index, "y", extents[index][1] * counts[1])
+        constrain_base(index, "z", extents[index][2] * counts[2])
     # compute the total number of write boundary lines
-    def constrain_write(index, dimension, halo, size):
+    def constrain_write(index, dimension, limit):
         """
         set the read write boundary width
         """
         print("w%n" + dimension +  str(index) + " - " +
               "e%n" + dimension + str(index) + " - " +
-              str(2 * halo * size) + " w%" + str(index) + " >= " + str(-2 * halo * size))
-    for index, stencil in enumerate(sequence):
-        constrain_write(index, "x", halos[0], sizes[0])
-        constrain_write(index, "y", halos[1], sizes[1])
-        constrain_write(index, "z", halos[2], sizes[2])
+              str(limit) + " w%" + str(index) + " >= " + str(-limit))
+    for index, _ in enumerate(sequence):
+        counts = limits["COUNTS"][index]
+        constrain_write(index, "x", extents[index][0] * counts[0])
+        constrain_write(index, "y", extents[index][1] * counts[1])
+        constrain_write(index, "z", extents[index][2] * counts[2])
     # set the stream boundary widths to the maximum of the read and read and write widths
     def constrain_streams(index, dimension):
         """
@@ -487,7 +759,7 @@ def compute_planes(sequence, dependencies, digits, halos, sizes):
         constrain_streams(index, "y")
         constrain_streams(index, "z")
 
-def compute_costs(sequence, dependencies, fetches, sizes, digits, halos, memory, cache, overlap):
+def compute_costs(sequence, dependencies, fetches, sizes, digits, limits, memory, cache, overlap):
     """
     compute the number of body and peel points
     """
@@ -496,7 +768,7 @@ def compute_costs(sequence, dependencies, fetches, sizes, digits, halos, memory,
         """
         multiply the peel cost with the number of tiles
         """
-        for digit in digits:
+        for digit, _ in digits:
             res = "p%n" + str(index) + "_" + str(digit)
             val = "p%" + str(index)
             mul = "n%x" + str(index) + "_" + str(digit)
@@ -508,7 +780,7 @@ def compute_costs(sequence, dependencies, fetches, sizes, digits, halos, memory,
         sum the peel for all tiles
         """
         prefix = "p%n" + str(index)
-        terms = " - ".join([str(2**x) + " " + prefix + "_" + str(x) for x in digits])
+        terms = " - ".join([str(y) + " " + prefix + "_" + str(x) for x, y in digits])
         print(prefix + " - " + terms + " = 0")
     # evaluate the cost model
     print(r"\ evaluate the cost model")
@@ -548,13 +820,17 @@ def compute_costs(sequence, dependencies, fetches, sizes, digits, halos, memory,
               " - ".join([str(stream * sizes[1] * sizes[2]) + " s%" + str(index),
                           str(stream * sizes[1]) + " s%nz" + str(index),
                           str(stream * sizes[2]) + " s%ny" + str(index)]) + " >= 0")
-        # compute the memory peel limit
-        limit = (base * sizes[1] * sizes[2] +
-                 base * sizes[1] * (2 * halos[2] * sizes[2]) +
-                 base * sizes[2] * (2 * halos[1] * sizes[1]) +
-                 stream * sizes[1] * sizes[2] * len(dependencies[stencil]) +
-                 stream * sizes[1] * len(dependencies[stencil]) * (2 * halos[2] * sizes[2]) +
-                 stream * sizes[2] * len(dependencies[stencil]) * (2 * halos[1] * sizes[1]))
+        # bound the memory peel time using the upper bounds of the positive terms
+        counts = limits["COUNTS"][index]
+        extents = limits["EXTENTS"][index]
+        reads = limits["READS"][index]
+        planes = [(extents[2] + extents[3]) * counts[1], (extents[4] + extents[5]) * counts[2]]
+        streams = [(extents[2] + extents[3] + reads[1]) * counts[1],
+                   (extents[4] + extents[5] + reads[2]) * counts[2]]
+        limit = (max(0, base) * (sizes[1] * sizes[2] + sizes[1] * planes[1] +
+                                 sizes[2] * planes[0]) +
+                 max(0, stream) * (sizes[1] * sizes[2] * (len(dependencies[stencil]) + 1) +
+                                   sizes[1] * streams[1] + sizes[2] * streams[0]))
         # compute the cache peel time
         const = fetches[stencil] * cache["PEEL"]
         print("p%" + str(index) + " - " +
@@ -562,10 +838,8 @@ def compute_costs(sequence, dependencies, fetches, sizes, digits, halos, memory,
                           str(const * sizes[2]) + " e%ny" + str(index)]) +
               " >= " + str(const * sizes[1] * sizes[2]))
         # compute an upper bound for the peel execution time
-        limit = max(limit,
-                    (const * sizes[1] * sizes[2] +
-                     const * sizes[1] * (2 * halos[2] * sizes[2])  +
-                     const * sizes[2] * (2 * halos[1] * sizes[1])))
+        limit = max(limit, const * (sizes[1] * sizes[2] + sizes[1] * planes[1] +
+                                    sizes[2] * planes[0]))
         # multiply the peel execution time with the number of tiles along the x dimension
         multiply_peels(index, digits[0], limit)
         sum_peels(index, digits[0])
@@ -593,6 +867,14 @@ def delimit_search(sequence, constraints):
             else:
                 print("n%" + dimension + str(sequence.index(stencil)) + " <= " + str(-value - 1))
 
+def fix_variables(fixed):
+    """
+    fix the variables determined by the presolve
+    """
+    print(r"\ fix the variables determined by the presolve")
+    for variable, value in fixed:
+        print(variable + " = " + str(value))
+
 def define_constraints(program):
     """
     define the constraints
@@ -604,30 +886,33 @@ def define_constraints(program):
     utilization = program["UTILIZATION"]
     dependencies = program["DEPENDENCIES"]
     fetches = program["FETCHES"]
-    halos = [program["HX"], program["HY"], program["HZ"]]
     cores = program["MACHINE"]["CORES"]
     sizes = [program["X"], program["Y"], program["Z"]]
     digits = [program["DX"], program["DY"], program["DZ"]]
     capacity = program["MACHINE"]["CAPACITY"]
-    memory = program["MEMORY"]
-    cache = program["CACHE"]
     overlap = program["OVERLAP"]
     slack = program["SLACK"]
     constraints = program["CONSTRAINTS"]
+    limits = program["LIMITS"]
+    # scale the time variables to center the cost coefficients around one
+    memory = dict([(x, y * program["SCALE"]) for x, y in program["MEMORY"].items()])
+    cache = dict([(x, y * program["SCALE"]) for x, y in program["CACHE"].items()])
     # compute the group indexes and tile sizes
-    compute_groups(sequence)
+    compute_groups(sequence, program["PAIRS"], limits)
     compute_memory(sequence, outputs, dependencies)
-    compute_tiles(sequence, cores, sizes, digits, slack)
+    onehot = program.get("COUNTS", "BINARY") == "CANDIDATES"
+    compute_tiles(sequence, cores, sizes, digits, slack, limits, onehot)
     # compute the evaluation and access
-    compute_boundaries(sequence, dependencies, halos)
+    compute_boundaries(sequence, dependencies, limits)
     # constrain the cache utilization
     compute_footprint(sequence, utilization)
-    constrain_footprint(sequence, sizes, capacity)
+    constrain_footprint(sequence, pad_domain(program), capacity)
     # compute the memory and cache costs
-    compute_planes(sequence, dependencies, digits, halos, sizes)
-    compute_costs(sequence, dependencies, fetches, sizes, digits, halos, memory, cache, overlap)
+    compute_planes(sequence, digits, limits)
+    compute_costs(sequence, dependencies, fetches, sizes, digits, limits, memory, cache, overlap)
     # add external constraints that limit the search space
     delimit_search(sequence, constraints)
+    fix_variables(program["FIXED"])
 
 def define_general(program):
     """
@@ -674,14 +959,14 @@ def define_general(program):
     print(" ".join(["d%z" + str(index) for index, _ in enumerate(sequence)]))
     # define the helper variables to compute the domain size variable
     for index, _ in enumerate(sequence):
-        print(" ".join(["d%x" + str(index) + "_" + str(digit) for digit in program["DX"]]))
-        print(" ".join(["d%y" + str(index) + "_" + str(digit) for digit in program["DY"]]))
-        print(" ".join(["d%z" + str(index) + "_" + str(digit) for digit in program["DZ"]]))
+        print(" ".join(["d%x" + str(index) + "_" + str(digit) for digit, _ in program["DX"]]))
+        print(" ".join(["d%y" + str(index) + "_" + str(digit) for digit, _ in program["DY"]]))
+        print(" ".join(["d%z" + str(index) + "_" + str(digit) for digit, _ in program["DZ"]]))
     # define the helper variables to compute the number of tiles
     for index, _ in enumerate(sequence):
-        print(" ".join(["n%xy" + str(index) + "_" + str(digit) for digit in program["DY"]]))
+        print(" ".join(["n%xy" + str(index) + "_" + str(digit) for digit, _ in program["DY"]]))
     for index, _ in enumerate(sequence):
-        print(" ".join(["n%xyz" + str(index) + "_" + str(digit) for digit in program["DZ"]]))
+        print(" ".join(["n%xyz" + str(index) + "_" + str(digit) for digit, _ in program["DZ"]]))
     # define the cache footprint
     print(" ".join(["f%" + str(index) for index, _ in enumerate(sequence)]))
     # define the evaluation boundary (cache fetches and memory costs)
@@ -690,9 +975,9 @@ def define_general(program):
     print(" ".join(["e%z" + str(index) for index, _ in enumerate(sequence)]))
     # define the helper variables to multiply the evaluation boundary by the number of tiles
     for index, _ in enumerate(sequence):
-        print(" ".join(["e%nx" + str(index) + "_" + str(digit) for digit in program["DX"]]))
-        print(" ".join(["e%ny" + str(index) + "_" + str(digit) for digit in program["DY"]]))
-        print(" ".join(["e%nz" + str(index) + "_" + str(digit) for digit in program["DZ"]]))
+        print(" ".join(["e%nx" + str(index) + "_" + str(digit) for digit, _ in program["DX"]]))
+        print(" ".join(["e%ny" + str(index) + "_" + str(digit) for digit, _ in program["DY"]]))
+        print(" ".join(["e%nz" + str(index) + "_" + str(digit) for digit, _ in program["DZ"]]))
     # define the total number of evaluation boundary lines (cache fetches and memory costs)
     print(" ".join(["e%nx" + str(index) for index, _ in enumerate(sequence)]))
     print(" ".join(["e%ny" + str(index) for index, _ in enumerate(sequence)]))
@@ -716,9 +1001,9 @@ def define_general(program):
     print(" ".join(["r%z" + str(index) for index, _ in enumerate(sequence)]))
     # define the helper variables to compute the total number of boundary reads
     for index, _ in enumerate(sequence):
-        print(" ".join(["r%nx" + str(index) + "_" + str(digit) for digit in program["DX"]]))
-        print(" ".join(["r%ny" + str(index) + "_" + str(digit) for digit in program["DY"]]))
-        print(" ".join(["r%nz" + str(index) + "_" + str(digit) for digit in program["DZ"]]))
+        print(" ".join(["r%nx" + str(index) + "_" + str(digit) for digit, _ in program["DX"]]))
+        print(" ".join(["r%ny" + str(index) + "_" + str(digit) for digit, _ in program["DY"]]))
+        print(" ".join(["r%nz" + str(index) + "_" + str(digit) for digit, _ in program["DZ"]]))
     # define the total number of boundary reads
     print(" ".join(["r%nx" + str(index) for index, _ in enumerate(sequence)]))
     print(" ".join(["r%ny" + str(index) for index, _ in enumerate(sequence)]))
@@ -745,13 +1030,12 @@ def define_binary(program):
     sequence = program["SEQUENCE"]
     dependencies = program["DEPENDENCIES"]
     # force group flags to one if the group indexes of the stencils do not match
-    for high in range(1, len(sequence)):
-        print(" ".join(["g%" + str(low) + "#" + str(high) for low in range(high)]))
+    print(" ".join(["g%" + str(low) + "#" + str(high) for low, high in sorted(program["PAIRS"])]))
     # number of tiles per dimension
     for index, _ in enumerate(sequence):
-        print(" ".join(["n%x" + str(index) + "_" + str(digit) for digit in program["DX"]]))
-        print(" ".join(["n%y" + str(index) + "_" + str(digit) for digit in program["DY"]]))
-        print(" ".join(["n%z" + str(index) + "_" + str(digit) for digit in program["DZ"]]))
+        print(" ".join(["n%x" + str(index) + "_" + str(digit) for digit, _ in program["DX"]]))
+        print(" ".join(["n%y" + str(index) + "_" + str(digit) for digit, _ in program["DY"]]))
+        print(" ".join(["n%z" + str(index) + "_" + str(digit) for digit, _ in program["DZ"]]))
     # define the per stencil read variables
     for index, stencil in enumerate(sequence):
         accesses = dependencies[stencil].keys()
@@ -759,6 +1043,7 @@ def define_binary(program):
     # define the read or write variables
     print(" ".join(["rw%" + str(index) for index, _ in enumerate(sequence)]))
 
+@profile_phase("LP EMISSION")
 def generate_lp(name, program):
     """
     generate the linear program
@@ -776,40 +1061,143 @@ def generate_lp(name, program):
     print("End")
     sys.stdout = out
     tmp.close()
+    count_metric("LP BYTES", getsize(name + ".lp"))
+
+def parse_log(log, scale=1.0):
+    """
+    return the progress and the final status of the solver log (in unscaled time units)
+    """
+    record = {"PROGRESS" : [], "STATUS" : None, "OBJECTIVE" : None, "BOUND" : None,
+              "GAP" : None, "TIME" : None, "ITERATIONS" : None, "NODES" : None}
+    time = 0.0
+    for line in log.splitlines():
+        # the cut annotations replace the bound of the node log lines
+        tokens = sub(r"[A-Za-z][\w ]*:\s*\d+", " - ", line.replace("*", " ")).split()
+        # parse the node log lines
+        if tokens and match(r"\d+\+?$", tokens[0]) and len(tokens) >= 4 and \
+           match(r"\d+$", tokens[1]):
+            heuristic = tokens[0].endswith("+")
+            gap = float(tokens[-1][:-1]) / 100.0 if tokens[-1].endswith("%") else None
+            numbers = tokens[:-1] if gap is not None else tokens
+            # the heuristic solutions do not report an iteration count
+            value = lambda x: None if x == "-" else float(x)
+            bound = value(numbers[-1] if heuristic else numbers[-2])
+            incumbent = None
+            if gap is not None:
+                incumbent = value(numbers[-2] if heuristic else numbers[-3])
+            record["PROGRESS"].append({
+                "NODE" : int(tokens[0].rstrip("+")), "LEFT" : int(tokens[1]), "TIME" : time,
+                "INCUMBENT" : incumbent, "BOUND" : bound, "GAP" : gap
+            })
+        elif line.startswith("Elapsed time = "):
+            time = float(line.split()[3])
+        elif line.startswith("MIP - ") or line.startswith("Populate - "):
+            record["STATUS"] = line.split(" - ", 1)[1].split(":")[0].split(",")[0].strip()
+            if "Objective =" in line:
+                record["OBJECTIVE"] = float(line.split("Objective =")[1])
+        elif line.startswith("Current MIP best bound = "):
+            record["BOUND"] = float(line.split()[5])
+            # the gap is missing if the solver found no integer solution
+            if line.endswith("%)"):
+                record["GAP"] = float(line.split(",")[-1].strip(" %)")) / 100.0
+        elif line.startswith("Solution time = "):
+            tokens = line.split()
+            record["TIME"] = float(tokens[3])
+            record["ITERATIONS"] = int(tokens[tokens.index("Iterations") + 2])
+            record["NODES"] = int(tokens[tokens.index("Nodes") + 2])
+    if record["GAP"] is None and record["STATUS"] is not None and "optimal" in record["STATUS"]:
+        record["BOUND"] = record["OBJECTIVE"]
+        record["GAP"] = 0.0
+    # undo the scaling of the time variables
+    unscale = lambda x: None if x is None else x / scale
+    for entry in [record] + record["PROGRESS"]:
+        for key in ["OBJECTIVE", "BOUND", "INCUMBENT"]:
+            if key in entry:
+                entry[key] = unscale(entry[key])
+    return record
 
-def solve_lp(name):
+@profile_phase("SOLVE")
+def solve_lp(name, settings=None, start=False, scale=1.0):
     """
-    run the solver
+    run the solver and return the parsed solver log
     """
+    settings = SOLVER if settings is None else settings
     program = name + ".lp"
     cleaned = name + "R.lp"
     result = name + ".sol"
     if exists(result):
         remove(result)
     # replace - - with +
-    with open(program) as infile, open(cleaned, 'w') as outfile:
-        for line in infile:
-            line = line.replace("- -", "+ ")
-            outfile.write(line)
-    remove(program)
-    copyfile(cleaned, program)
-    remove(cleaned)
-    # start cplex and set the mipgap parameter before running the optimization
-    proc = Popen(["cplex"], stdin=PIPE)
-    proc.communicate(b"read " + program.encode() + b"\n" +
-                     b"mipopt\n" +
-                     b"write " + result.encode() + b"\n" +
-                     b"quit\n")
-    # proc.communicate(b"set mip tolerances mipgap 0.0001\n" +
-    #                  b"read " + program.encode() + b"\n" +
-    #                  b"mipopt\n" +
-    #                  b"write " + result.encode() + b"\n" +
-    #                  b"quit\n")
+    with measure_phase("REWRITE"):
+        with open(program) as infile, open(cleaned, 'w') as outfile:
+            for line in infile:
+                line = line.replace("- -", "+ ")
+                outfile.write(line)
+        remove(program)
+        copyfile(cleaned, program)
+        remove(cleaned)
+    # start cplex and set the solver parameters before running the optimization
+    commands = ""
+    if settings.get("MIPGAP") is not None:
+        commands += "set mip tolerances mipgap " + str(settings["MIPGAP"]) + "\n"
+    if settings.get("TIMELIMIT") is not None:
+        commands += "set timelimit " + str(settings["TIMELIMIT"]) + "\n"
+    if settings.get("THREADS") is not None:
+        commands += "set threads " + str(settings["THREADS"]) + "\n"
+    if settings.get("EMPHASIS") is not None:
+        commands += "set emphasis mip " + str(settings["EMPHASIS"]) + "\n"
+    if settings.get("NODELIMIT") is not None:
+        commands += "set mip limits nodes " + str(settings["NODELIMIT"]) + "\n"
+    # collect the near optimal solutions in the solution pool
+    if settings.get("POOL") is not None:
+        commands += "set mip pool capacity " + str(settings["POOL"] * POPULATE) + "\n"
+        commands += "set mip limits populate " + str(settings["POOL"] * POPULATE) + "\n"
+        if settings.get("POOLGAP") is not None:
+            commands += "set mip pool relgap " + str(settings["POOLGAP"]) + "\n"
+    commands += "read " + program + "\n"
+    if start:
+        commands += "read " + name + ".mst\n"
+    if settings.get("POOL") is not None:
+        commands += "populate\n"
+        commands += "write " + result + " all\n"
+    else:
+        commands += "mipopt\n"
+        commands += "write " + result + "\n"
+    commands += "quit\n"
+    with measure_phase("SOLVER"):
+        proc = Popen(["cplex"], stdin=PIPE, stdout=PIPE)
+        log = proc.communicate(commands.encode())[0].decode()
+    print(log)
+    with open(name + ".log", "w") as file:
+        file.write(log)
+    # store the solver progress next to the solution
+    record = parse_log(log, scale)
+    record["SETTINGS"] = dict(settings)
+    with open(name + ".json", "w") as file:
+        dump(record, file, indent=4)
+    print(" ==> solver status " + str(record["STATUS"]) + "\t-> gap " + str(record["GAP"]) +
+          "\t-> time " + str(record["TIME"]) + " s\t-> nodes " + str(record["NODES"]))
     print("done!")
+    return record
 
-def parse_lp(name, program):
+def tile_overhead(program):
     """
-    parse the solver output
+    return the time overhead per tile and stencil
+    """
+    return 6 * (program["MEMORY"]["RW BODY"] + program["MEMORY"]["ST BODY"])
+
+def combine_times(memory_body, cache_body, memory_peel, cache_peel, overlap):
+    """
+    return the execution time of a stencil given its memory and cache times
+    """
+    # the objective of the linear program overlaps the memory and cache times partially
+    return (max(memory_peel, cache_peel) + overlap * max(memory_body, cache_body) +
+            (1.0 - overlap) * (memory_body + cache_body))
+
+@profile_phase("PARSE SOLUTION")
+def parse_lp(name, program, solution=None):
+    """
+    parse the solver output (by default the best solution of the pool, else the given node)
     """
     # prepare parsing
     sequence = program["SEQUENCE"]
@@ -822,8 +1210,14 @@ def parse_lp(name, program):
     result = name + ".sol"
     # search xml for important information
     if exists(result):
-        print("parsing " + result)
-        dom = parse(result)
+        if solution is None:
+            print("parsing " + result)
+            with measure_phase("XML PARSING"):
+                solutions = parse(result).getElementsByTagName("CPLEXSolution")
+            headers = [x.getElementsByTagName("header")[0] for x in solutions]
+            objectives = [float(x.attributes["objectiveValue"].value) for x in headers]
+            solution = solutions[objectives.index(min(objectives))]
+        dom = solution
         variables = list(map(
             lambda var: (var.attributes["name"].value, round(float(var.attributes["value"].value))),
             dom.getElementsByTagName("variable")
@@ -897,6 +1291,7 @@ def parse_lp(name, program):
             print(buffer)
         # print the estimated execution time
         objective = dom.getElementsByTagName("header")[0].attributes["objectiveValue"].value
+        objective = str(float(objective) / program["SCALE"])
         print(" ==> estimated execution time [ms] " + objective)
         program["OBJECTIVE"] = objective
         memory_body = []
@@ -989,26 +1384,723 @@ def parse_lp(name, program):
         peel = sum(list(map(max, memory_peel, cache_peel)))
         body = overlap * sum(list(map(max, memory_body, cache_body)))
         body += (1.0 - overlap) * sum(list(map(lambda x, y: x + y, memory_body, cache_body)))
-        overhead = 6 * (program["MEMORY"]["RW BODY"] + program["MEMORY"]["ST BODY"])
+        overhead = tile_overhead(program)
         extra = sum([x[0] * x[1] * x[2] * overhead for x in tile_counts])
-        total = peel + body + extra
+        # store the execution time per stencil
+        program["COSTS"] = dict([(x, combine_times(*y, overlap) + z[0] * z[1] * z[2] * overhead)
+                                 for x, y, z in zip(sequence, zip(memory_body, cache_body,
+                                                                  memory_peel, cache_peel),
+                                                    tile_counts)])
+        total = sum(program["COSTS"].values())
         print(" ==> peel time: " + str(peel))
         print(" ==> body time: " + str(body))
         print(" ==> extra time: " + str(extra))
         print(" ==> total time: " + str(total))
+        print(" ==> model deviation: " + str(abs(total - float(objective)) / abs(total)))
+
+def analyze_group(program, group):
+    """
+    compute the tile count independent cost terms of the stencils fused in one group
+    """
+    outputs = program["OUTPUTS"]
+    dependencies = program["DEPENDENCIES"]
+    halos = [program["HX"], program["HY"], program["HZ"]]
+    # find the last predecessor in the group that satisfies the condition
+    def find_last(index, condition):
+        """
+        return the index of the last predecessor that satisfies the condition
+        """
+        return next((x for x in reversed(range(index)) if condition(group[x])), None)
+    # extend the evaluation domains of the producers by the offsets of the consumers
+    extents = [[0] * 6 for _ in group]
+    for index in reversed(range(len(group))):
+        for name, offsets in dependencies[group[index]].items():
+            if name in group:
+                access = group.index(name)
+                for dim in range(6):
+                    width = extents[index][dim] + abs(offsets[dim // 2][dim % 2])
+                    extents[access][dim] = max(extents[access][dim], width)
+    # compute the loads, stores, and boundary reads per stencil
+    terms = []
+    accesses = {}
+    for index, stencil in enumerate(group):
+        reads = 0
+        planes = [0, 0, 0]
+        for name, offsets in dependencies[stencil].items():
+            last = find_last(index, lambda x: x == name or name in dependencies[x])
+            reads += 0 if last is not None else 1
+            previous = find_last(index, lambda x: name in dependencies[x])
+            accesses[(index, name)] = [0] * 6
+            for dim in range(6):
+                halo = halos[dim // 2]
+                width = extents[index][dim] + abs(offsets[dim // 2][dim % 2])
+                width = max(0, width - halo) if name in group else width
+                # fill the difference with respect to the predecessor of the same group
+                if previous is not None:
+                    width = max(width, accesses[(previous, name)][dim])
+                    read = max(0, width - halo, width - accesses[(previous, name)][dim])
+                else:
+                    read = width
+                accesses[(index, name)][dim] = width
+                planes[dim // 2] += read
+        # store the result if it is an output or consumed outside of the group
+        consumers = [x for x in dependencies if stencil in dependencies[x] and x not in group]
+        writes = 1 if stencil in outputs or consumers else 0
+        terms.append({
+            "RW" : 1 if reads + writes > 0 else 0,
+            "W" : writes,
+            "S" : reads + writes,
+            "E" : [extents[index][0] + extents[index][1],
+                   extents[index][2] + extents[index][3],
+                   extents[index][4] + extents[index][5]],
+            "R" : planes,
+            "F" : program["FETCHES"][stencil]
+        })
+    return terms
+
+def linearize_terms(program, terms):
+    """
+    return the memory and cache body and peel times as linear functions of the tile counts
+    """
+    sizes = [program["X"], program["Y"], program["Z"]]
+    memory = program["MEMORY"]
+    cache = program["CACHE"]
+    volume = sizes[0] * sizes[1] * sizes[2]
+    areas = [sizes[1] * sizes[2], sizes[0] * sizes[2], sizes[0] * sizes[1]]
+    lines = [sizes[0], sizes[2], sizes[1]]
+    functions = []
+    for term in terms:
+        # compute the boundary planes per tile for the read or write and the stream counts
+        base = [x * term["RW"] for x in term["E"]]
+        streams = [x * term["W"] + y for x, y in zip(term["E"], term["R"])]
+        const = term["F"] * cache["BODY"]
+        body0 = [(memory["RW BODY"] * term["RW"] + memory["ST BODY"] * term["S"]) * volume]
+        body0 += [(memory["RW BODY"] * x + memory["ST BODY"] * y) * z
+                  for x, y, z in zip(base, streams, areas)]
+        body1 = [const * volume] + [const * x * y for x, y in zip(term["E"], areas)]
+        # the peel times exclude the x dimension that multiplies the peel per tile
+        const = term["F"] * cache["PEEL"]
+        peel0 = [(memory["RW PEEL"] * term["RW"] + memory["ST PEEL"] * term["S"]) * areas[0]]
+        peel0 += [0.0] + [(memory["RW PEEL"] * x + memory["ST PEEL"] * y) * z
+                          for x, y, z in zip(base[1:], streams[1:], lines[1:])]
+        peel1 = [const * areas[0], 0.0] + [const * x * y for x, y in zip(term["E"][1:], lines[1:])]
+        functions.append((body0, body1, peel0, peel1))
+    return functions
+
+def evaluate_group(program, functions, counts):
+    """
+    evaluate the body and peel times of the linear program for the given tile counts
+    """
+    overlap = program["OVERLAP"]
+    total = 0.0
+    for body0, body1, peel0, peel1 in functions:
+        time0 = max(0.0, body0[0] + body0[1] * counts[0] + body0[2] * counts[1] +
+                    body0[3] * counts[2])
+        time1 = body1[0] + body1[1] * counts[0] + body1[2] * counts[1] + body1[3] * counts[2]
+        # the peel times are linear per tile in the x dimension
+        time2 = max(0.0, peel0[0] + peel0[2] * counts[1] + peel0[3] * counts[2]) * counts[0]
+        time3 = (peel1[0] + peel1[2] * counts[1] + peel1[3] * counts[2]) * counts[0]
+        total += combine_times(time0, time1, time2, time3, overlap)
+    return total
+
+def bound_function(function, counts):
+    """
+    return the minimum and the maximum of a linear function over the candidate tile counts
+    """
+    lower = function[0]
+    upper = function[0]
+    for coefficient, candidates in zip(function[1:], counts):
+        lower += min(coefficient * candidates[0], coefficient * candidates[-1])
+        upper += max(coefficient * candidates[0], coefficient * candidates[-1])
+    return lower, upper
+
+def split_functions(program, functions, counts):
+    """
+    sum the cost terms whose maxima do not depend on the tile counts and return the others
+    """
+    overlap = program["OVERLAP"]
+    body = [0.0] * 4
+    peel = [0.0] * 4
+    mixed = []
+    combine = lambda x, y, z: [a * x + b * y for a, b in zip(z[0], z[1])]
+    for body0, body1, peel0, peel1 in functions:
+        # select the maximum of the memory and the cache body times
+        bounds0 = bound_function(body0, counts)
+        bounds1 = bound_function(combine(1.0, -1.0, (body1, body0)), counts)
+        if bounds0[1] <= 0.0:
+            time0 = body1
+        elif bounds0[0] >= 0.0 and bounds1[0] >= 0.0:
+            time0 = combine(1.0, 1.0 - overlap, (body1, body0))
+        elif bounds0[0] >= 0.0 and bounds1[1] <= 0.0:
+            time0 = combine(1.0, 1.0 - overlap, (body0, body1))
+        else:
+            mixed.append((body0, body1, peel0, peel1))
+            continue
+        # select the maximum of the memory and the cache peel times
+        bounds0 = bound_function(peel0, counts)
+        bounds1 = bound_function(combine(1.0, -1.0, (peel1, peel0)), counts)
+        if bounds1[0] >= 0.0:
+            time1 = peel1
+        elif bounds1[1] <= 0.0 and bounds0[0] >= 0.0:
+            time1 = peel0
+        else:
+            mixed.append((body0, body1, peel0, peel1))
+            continue
+        body = combine(1.0, 1.0, (body, time0))
+        peel = combine(1.0, 1.0, (peel, time1))
+    return body, peel, mixed
+
+def compute_counts(program, group):
+    """
+    return the tile counts per dimension that satisfy the size slack and the tiling constraints
+    """
+    slack = program["SLACK"]
+    sizes = [program["X"], program["Y"], program["Z"]]
+    bounds = [[1, x] for x in sizes]
+    for dimension, stencil, value in program["CONSTRAINTS"].get("TILING", []):
+        if stencil in group:
+            dim = "xyz".index(dimension)
+            if value > 0:
+                bounds[dim][0] = max(bounds[dim][0], value + 1)
+            else:
+                bounds[dim][1] = min(bounds[dim][1], -value - 1)
+    counts = []
+    for size, (lower, upper) in zip(sizes, bounds):
+        counts.append([x for x in range(lower, upper + 1)
+                       if (1.0 - slack["SIZE"]) * ((size + x - 1) // x) * x <= size])
+    # restrict the tile counts to the candidate sets
+    if program.get("COUNTS", "BINARY") == "CANDIDATES":
+        candidates = compute_candidates(program)
+        counts = [[x for x in y if x in z] for y, z in zip(counts, candidates)]
+    return counts
+
+def search_tiling(program, group):
+    """
+    return the cheapest tile counts of a group that satisfy the core and footprint constraints
+    """
+    cores = program["MACHINE"]["CORES"]
+    capacity = program["MACHINE"]["CAPACITY"]
+    slack = program["SLACK"]
+    volume = reduce(lambda x, y: x * y, pad_domain(program))
+    overhead = tile_overhead(program) * len(group)
+    accesses = [set(list(program["DEPENDENCIES"][x].keys()) + [x]) for x in group]
+    footprint = len(reduce(set.union, accesses))
+    best = (float("inf"), None)
+    counts = compute_counts(program, group)
+    if [x for x in counts if not x]:
+        return best
+    functions = linearize_terms(program, analyze_group(program, group))
+    body, peel, mixed = split_functions(program, functions, counts)
+    # bound the remaining terms from below by their cache times
+    lower = [body, peel]
+    for _, body1, _, peel1 in mixed:
+        lower = [[x + y for x, y in zip(lower[0], body1)], [x + y for x, y in zip(lower[1], peel1)]]
+    evaluate = lambda x, y, z: (x[0] + x[1] * z[0] + x[2] * z[1] + x[3] * z[2] +
+                                (y[0] + y[2] * z[1] + y[3] * z[2]) * z[0] +
+                                overhead * z[0] * z[1] * z[2])
+    candidates = []
+    for count0 in counts[0]:
+        for count1 in counts[1]:
+            for count2 in counts[2]:
+                total = count0 * count1 * count2
+                # use most of the cores and fit the footprint into the cache
+                if total < cores:
+                    continue
+                if (1.0 - slack["CORES"]) * cores * ((total + cores - 1) // cores) > total:
+                    continue
+                if capacity // SIZE_OF_VALUE * total < volume * footprint:
+                    continue
+                candidates.append((evaluate(lower[0], lower[1], (count0, count1, count2)),
+                                   (count0, count1, count2)))
+    # evaluate the candidates in the order of their lower bounds
+    for bound, candidate in sorted(candidates):
+        if bound >= best[0]:
+            break
+        cost = evaluate(body, peel, candidate)
+        if mixed:
+            cost += evaluate_group(program, mixed, candidate)
+        if cost < best[0]:
+            best = (cost, candidate)
+    return best
+
+def cache_tiling(program, group, costs):
+    """
+    return the cheapest tile counts of a group and store them in the cache
+    """
+    group = tuple(group)
+    if group not in costs:
+        costs[group] = search_tiling(program, group)
+    return costs[group]
+
+def partition_sequence(program, sequence, costs):
+    """
+    return the cheapest groups of the sequence using dynamic programming over the group boundaries
+    """
+    fixed = dict(program["CONSTRAINTS"].get("GROUPS", []))
+    # the states map the end of the prefix and the group count to the cheapest partition
+    states = {(0, 0) : (0.0, None, None)}
+    for high in range(1, len(sequence) + 1):
+        # extending an infeasible group only increases its footprint
+        for low in reversed(range(high)):
+            cost, counts = cache_tiling(program, sequence[low:high], costs)
+            if counts is None:
+                break
+            for group in range(low + 1):
+                if (low, group) not in states:
+                    continue
+                if [x for x in sequence[low:high] if fixed.get(x, group) != group]:
+                    continue
+                total = states[(low, group)][0] + cost
+                if (high, group + 1) not in states or total < states[(high, group + 1)][0]:
+                    states[(high, group + 1)] = (total, low, counts)
+    ends = [x for x in states if x[0] == len(sequence)]
+    if not ends:
+        return float("inf"), None
+    # collect the groups of the cheapest partition
+    state = min(ends, key=lambda x: states[x][0])
+    objective = states[state][0]
+    groups = []
+    while state[0] > 0:
+        _, low, counts = states[state]
+        groups.insert(0, {"STENCILS" : sequence[low:state[0]],
+                          "NX" : counts[0], "NY" : counts[1], "NZ" : counts[2]})
+        state = (low, state[1] - 1)
+    return objective, groups
+
+# fuse and tile the stencil sequence without solving the linear program
+@profile_phase("HEURISTIC")
+def partition_program(program):
+    """
+    select the groups and tile counts using dynamic programming over the group boundaries
+    """
+    start = perf_counter()
+    objective, groups = partition_sequence(program, program["SEQUENCE"], {})
+    assert groups is not None, "no feasible fusion and tiling"
+    elapsed = perf_counter() - start
+    for index, group in enumerate(groups):
+        print("group " + str(index) + "\t-> " + ", ".join(group["STENCILS"]) +
+              "\t-> tiles (" + str(group["NX"]) + ", " + str(group["NY"]) + ", " +
+              str(group["NZ"]) + ")")
+    print(" ==> estimated execution time [ms] " + str(objective))
+    program["TILING"] = {"NX" : 1, "NY" : 1, "NZ" : 1,
+                         "GROUPS" : [{"GROUPS": [x]} for x in groups]}
+    program["OBJECTIVE"] = str(objective)
+    return {"PROGRESS" : [], "STATUS" : "dynamic programming", "OBJECTIVE" : objective,
+            "BOUND" : None, "GAP" : None, "TIME" : elapsed, "ITERATIONS" : None, "NODES" : None}
+
+def count_orders(program, limit):
+    """
+    return the number of topological stencil orders or limit plus one if there are more
+    """
+    stencils = list(program["STENCILS"].keys())
+    dependencies = program["DEPENDENCIES"]
+    counts = {}
+    # count the orders of the remaining stencils once per set of scheduled stencils
+    def count(done):
+        """
+        count the orders that complete the scheduled stencils
+        """
+        if len(done) == len(stencils):
+            return 1
+        if done not in counts:
+            ready = [x for x in stencils if x not in done and
+                     not [y for y in dependencies[x] if y in stencils and y not in done]]
+            counts[done] = min(limit + 1, sum([count(done | frozenset([x])) for x in ready]))
+        return counts[done]
+    return count(frozenset())
+
+def enumerate_orders(program, costs):
+    """
+    return the cheapest topological order using enumeration with dominance pruning
+    """
+    stencils = list(program["STENCILS"].keys())
+    dependencies = program["DEPENDENCIES"]
+    fixed = dict(program["CONSTRAINTS"].get("GROUPS", []))
+    best = [float("inf"), None]
+    signatures = {}
+    # extend the prefix and update the cheapest partitions closed at every position
+    def extend(prefix, states):
+        """
+        enumerate the orders that start with the prefix
+        """
+        if len(prefix) == len(stencils):
+            if states[-1] and min(states[-1].values()) < best[0]:
+                best[0] = min(states[-1].values())
+                best[1] = list(prefix)
+            return
+        # the cost of the completions only depends on the open group and the closed cost
+        entries = {}
+        for low, closed in enumerate(states):
+            tail = tuple(prefix[low:])
+            if not tail or costs.get(tail, (float("inf"), None))[1] is not None:
+                for count, value in closed.items():
+                    entries[(tail, count)] = value
+        # prune the prefix if prefixes of the same stencils were at least as cheap
+        stored = signatures.setdefault(frozenset(prefix), {})
+        if not [x for x, y in entries.items() if stored.get(x, float("inf")) > y]:
+            return
+        for entry, value in entries.items():
+            stored[entry] = min(value, stored.get(entry, float("inf")))
+        for stencil in stencils:
+            if stencil in prefix:
+                continue
+            if [x for x in dependencies[stencil] if x in stencils and x not in prefix]:
+                continue
+            sequence = prefix + [stencil]
+            row = {}
+            for low in reversed(range(len(sequence))):
+                cost, counts = cache_tiling(program, sequence[low:], costs)
+                if counts is None:
+                    break
+                for count, value in states[low].items():
+                    if not [x for x in sequence[low:] if fixed.get(x, count) != count]:
+                        row[count + 1] = min(row.get(count + 1, float("inf")), value + cost)
+            extend(sequence, states + [row])
+    extend([], [{0 : 0.0}])
+    return best[0], best[1]
+
+def improve_order(program, sequence, costs):
+    """
+    return a locally optimal order found by moving single stencils while the cost decreases
+    """
+    dependencies = program["DEPENDENCIES"]
+    best = partition_sequence(program, sequence, costs)[0]
+    improved = True
+    while improved:
+        improved = False
+        for stencil in list(sequence):
+            # move the stencil between its last producer and its first consumer
+            rest = [x for x in sequence if x != stencil]
+            producers = [index for index, x in enumerate(rest) if x in dependencies[stencil]]
+            consumers = [index for index, x in enumerate(rest) if stencil in dependencies[x]]
+            low = max(producers) + 1 if producers else 0
+            high = min(consumers) if consumers else len(rest)
+            for position in range(low, high + 1):
+                candidate = rest[:position] + [stencil] + rest[position:]
+                cost = partition_sequence(program, candidate, costs)[0]
+                if cost < best:
+                    best = cost
+                    sequence = candidate
+                    improved = True
+                    break
+    return best, sequence
+
+# search the stencil order jointly with the fusion and tiling
+@profile_phase("ORDER SEARCH")
+def search_sequence(program):
+    """
+    return the stencil order with the cheapest fusion and tiling according to the cost model
+    """
+    start = perf_counter()
+    costs = {}
+    count = count_orders(program, ORDERS)
+    if count <= ORDERS:
+        print("-> enumerating " + str(count) + " stencil orders")
+        objective, sequence = enumerate_orders(program, costs)
+    else:
+        print("-> improving the stencil order with local search")
+        sequence = program["SEQUENCE"] if "SEQUENCE" in program else sample_sequence(program)
+        objective, sequence = improve_order(program, list(sequence), costs)
+    assert sequence is not None, "no feasible fusion and tiling"
+    print(" ==> order cost " + str(objective) + "\t-> groups " + str(len(costs)) +
+          "\t-> time " + "{0:.2f}".format(perf_counter() - start) + " s")
+    return sequence
+
+@profile_phase("MIP START")
+def write_start(name, program):
+    """
+    write the group indexes and tile counts of the current tiling as mip start
+    """
+    sequence = program["SEQUENCE"]
+    digits = [program["DX"], program["DY"], program["DZ"]]
+    onehot = program.get("COUNTS", "BINARY") == "CANDIDATES"
+    values = []
+    for group, group0 in enumerate(program["TILING"]["GROUPS"]):
+        for group1 in group0["GROUPS"]:
+            counts = [group1["NX"], group1["NY"], group1["NZ"]]
+            for stencil in group1["STENCILS"]:
+                index = sequence.index(stencil)
+                values.append(("g%" + str(index), group))
+                for dimension, count, digit in zip(["x", "y", "z"], counts, digits):
+                    values += [("n%" + dimension + str(index) + "_" + str(x),
+                                int(count == y) if onehot else (count // y) % 2)
+                               for x, y in digit]
+    # set the group flags of the stencil pairs
+    indexes = dict(values)
+    for low, high in sorted(program["PAIRS"]):
+        flag = 1 if indexes["g%" + str(low)] != indexes["g%" + str(high)] else 0
+        values.append(("g%" + str(low) + "#" + str(high), flag))
+    with open(name + ".mst", "w") as file:
+        file.write("<?xml version = \"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>\n")
+        file.write("<CPLEXSolution version=\"1.2\">\n")
+        file.write(" <header problemName=\"" + name + ".lp\" solutionName=\"m1\"/>\n")
+        file.write(" <variables>\n")
+        for variable, value in values:
+            file.write("  <variable name=\"" + variable + "\" value=\"" + str(value) + "\"/>\n")
+        file.write(" </variables>\n")
+        file.write("</CPLEXSolution>\n")
+
+def compute_components(program, threshold):
+    """
+    split the sequence into components without producer consumer edges and shared inputs
+    """
+    sequence = program["SEQUENCE"]
+    dependencies = program["DEPENDENCIES"]
+    # merge the stencils connected by an edge or by more than threshold shared arrays
+    roots = dict([(x, x) for x in sequence])
+    def find_root(stencil):
+        """
+        return the representative of the component
+        """
+        while roots[stencil] != stencil:
+            stencil = roots[stencil]
+        return stencil
+    for low, stencil0 in enumerate(sequence):
+        for stencil1 in sequence[low + 1:]:
+            shared = set(dependencies[stencil0].keys()).intersection(dependencies[stencil1].keys())
+            if stencil0 in dependencies[stencil1] or len(shared) > threshold:
+                roots[find_root(stencil1)] = find_root(stencil0)
+    # order the components by their first stencil
+    components = []
+    for stencil in sequence:
+        component = next((x for x in components if find_root(x[0]) == find_root(stencil)), None)
+        if component is None:
+            components.append([stencil])
+        else:
+            component.append(stencil)
+    return components
+
+def extract_component(program, component):
+    """
+    return the program restricted to the stencils of the component
+    """
+    result = dict([(x, y) for x, y in program.items() if x not in ("TILING", "TELEMETRY")])
+    result["STENCILS"] = dict([(x, program["STENCILS"][x]) for x in component])
+    result["SEQUENCE"] = list(component)
+    # store the stencils consumed outside of the component
+    consumers = [x for x in program["SEQUENCE"] if x not in component]
+    result["OUTPUTS"] = [x for x in component if x in program["OUTPUTS"] or
+                         [y for y in consumers if x in program["DEPENDENCIES"][y]]]
+    result["DEPENDENCIES"] = dict([(x, program["DEPENDENCIES"][x]) for x in component])
+    result["FETCHES"] = dict([(x, program["FETCHES"][x]) for x in component])
+    result["CONSTRAINTS"] = dict(program["CONSTRAINTS"])
+    if "TILING" in program["CONSTRAINTS"]:
+        result["CONSTRAINTS"]["TILING"] = [x for x in program["CONSTRAINTS"]["TILING"]
+                                           if x[1] in component]
+    compute_utilization(result)
+    compute_domain(result)
+    return result
+
+@profile_phase("PRESOLVE")
+def bound_program(program):
+    """
+    presolve the program and compute the big-M constants and the time scale
+    """
+    presolve_program(program)
+    compute_limits(program)
+    program["SCALE"] = compute_scale(program)
+
+# solve the components of the program concurrently and stitch the plans together
+def decompose_program(name, program, components, settings):
+    """
+    optimize the components separately and combine their tilings
+    """
+    method = settings.get("METHOD", "MILP")
+    parts = []
+    for index, component in enumerate(components):
+        part = extract_component(program, component)
+        bound_program(part)
+        if method == "WARM":
+            partition_program(part)
+            write_start(name + "_" + str(index), part)
+        generate_lp(name + "_" + str(index), part)
+        parts.append((name + "_" + str(index), part))
+    print("-> solving " + str(len(parts)) + " components concurrently")
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=len(parts)) as executor:
+        # the solver threads measure their phases in the experiment of the program
+        solve = bind_experiment(lambda x: solve_lp(x[0], settings, method == "WARM",
+                                                   x[1]["SCALE"]))
+        records = list(executor.map(solve, parts))
+    elapsed = perf_counter() - start
+    for name, part in parts:
+        parse_lp(name, part)
+    # combine the solver records
+    total = lambda x: None if None in [y[x] for y in records] else sum([y[x] for y in records])
+    record = {"PROGRESS" : [], "STATUS" : ", ".join([str(x["STATUS"]) for x in records]),
+              "OBJECTIVE" : total("OBJECTIVE"), "BOUND" : total("BOUND"), "GAP" : None,
+              "TIME" : elapsed, "ITERATIONS" : total("ITERATIONS"), "NODES" : total("NODES"),
+              "COMPONENTS" : records}
+    if record["OBJECTIVE"] and record["BOUND"] is not None:
+        record["GAP"] = (record["OBJECTIVE"] - record["BOUND"]) / abs(record["OBJECTIVE"])
+    program["TELEMETRY"] = record
+    # concatenate the group sequences of the components
+    if False in ["TILING" in x for _, x in parts]:
+        return
+    # the utilization is indexed by the sequence positions
+    program["SEQUENCE"] = [x for y in components for x in y]
+    compute_utilization(program)
+    program["TILING"] = {"NX" : 1, "NY" : 1, "NZ" : 1,
+                         "GROUPS" : [x for _, y in parts for x in y["TILING"]["GROUPS"]]}
+    program["OBJECTIVE"] = str(sum([float(x["OBJECTIVE"]) for _, x in parts]))
+    print(" ==> estimated execution time [ms] " + program["OBJECTIVE"])
+
+# optimize overlapping windows of the sequence and commit all but their last group
+def roll_program(name, program, window, settings):
+    """
+    optimize the sequence window by window and compare the plan to a global bound
+    """
+    method = settings.get("METHOD", "MILP")
+    sequence = program["SEQUENCE"]
+    start = perf_counter()
+    groups = []
+    records = []
+    total = lambda x: None if None in [y[x] for y in records] else sum([y[x] for y in records])
+    objective = 0.0
+    begin = 0
+    while begin < len(sequence):
+        # the committed groups are fixed and their results are inputs of the window
+        part = extract_component(program, sequence[begin:begin + window])
+        index = name + "_" + str(len(records))
+        bound_program(part)
+        if method == "WARM":
+            partition_program(part)
+            write_start(index, part)
+        generate_lp(index, part)
+        records.append(solve_lp(index, settings, method == "WARM", part["SCALE"]))
+        parse_lp(index, part)
+        if "TILING" not in part:
+            program["TELEMETRY"] = {
+                "PROGRESS" : [], "STATUS" : "rolling horizon failed in window " + str(len(records)),
+                "OBJECTIVE" : None, "BOUND" : None, "GAP" : None, "TIME" : perf_counter() - start,
+                "ITERATIONS" : total("ITERATIONS"), "NODES" : total("NODES"), "WINDOWS" : records
+            }
+            return
+        # the last group may grow into the next window unless the sequence ends
+        found = [x["GROUPS"][0] for x in part["TILING"]["GROUPS"] if x["GROUPS"][0]["STENCILS"]]
+        if begin + window < len(sequence) and len(found) > 1:
+            found = found[:-1]
+        groups += found
+        committed = [x for y in found for x in y["STENCILS"]]
+        objective += sum([part["COSTS"][x] for x in committed])
+        begin += len(committed)
+        print("-> window " + str(len(records)) + " committed " + str(len(found)) +
+              " groups\t-> stencils " + str(begin) + " of " + str(len(sequence)))
+    elapsed = perf_counter() - start
+    # bound the objective of the full program with the root node of its linear program
+    bound_program(program)
+    generate_lp(name + "_bound", program)
+    record = solve_lp(name + "_bound", dict(settings, NODELIMIT=0), False, program["SCALE"])
+    loss = None
+    if record["BOUND"] is not None:
+        loss = (objective - record["BOUND"]) / abs(objective)
+    program["TILING"] = {"NX" : 1, "NY" : 1, "NZ" : 1, "GROUPS" : [{"GROUPS": [x]} for x in groups]}
+    program["OBJECTIVE"] = str(objective)
+    print(" ==> estimated execution time [ms] " + program["OBJECTIVE"])
+    print(" ==> global bound [ms] " + str(record["BOUND"]) + "\t-> loss " + str(loss))
+    program["TELEMETRY"] = {
+        "PROGRESS" : [], "STATUS" : "rolling horizon", "OBJECTIVE" : objective,
+        "BOUND" : record["BOUND"], "GAP" : loss, "TIME" : elapsed,
+        "ITERATIONS" : total("ITERATIONS"), "NODES" : total("NODES"),
+        "WINDOWS" : records, "RELAXATION" : record
+    }
+
+def parse_pool(name, program, count, gap=None):
+    """
+    return the best distinct plans of the solution pool within the relative gap
+    """
+    if not exists(name + ".sol"):
+        return []
+    plans = []
+    tilings = set()
+    print("parsing " + name + ".sol")
+    with measure_phase("XML PARSING"):
+        solutions = parse(name + ".sol").getElementsByTagName("CPLEXSolution")
+    for solution in solutions:
+        # parse the solution into a shallow copy that receives its own tiling
+        plan = dict(program)
+        parse_lp(name, plan, solution)
+        tiling = canonical_tiling(plan["TILING"])
+        if tiling not in tilings:
+            tilings.add(tiling)
+            plans.append({"TILING" : plan["TILING"], "OBJECTIVE" : plan["OBJECTIVE"]})
+    plans = sorted(plans, key=lambda x: float(x["OBJECTIVE"]))[:count]
+    if plans and gap is not None:
+        limit = float(plans[0]["OBJECTIVE"]) + gap * abs(float(plans[0]["OBJECTIVE"]))
+        plans = [x for x in plans if float(x["OBJECTIVE"]) <= limit]
+    print("-> solution pool")
+    for plan in plans:
+        print("   - " + plan["OBJECTIVE"] + " ms\t-> " + " | ".join(
+            [", ".join(x["GROUPS"][0]["STENCILS"]) for x in plan["TILING"]["GROUPS"]]))
+    return plans
+
+def canonical_problem(program):
+    """
+    return a hashable form of the configuration and constraints that determine the plan
+    """
+    settings = dict([(x, program[x]) for x in PROBLEM if x in program])
+    constraints = program["CONSTRAINTS"]
+    # keep the tightest tile count bounds per dimension and stencil
+    bounds = {}
+    for dimension, stencil, value in constraints.get("TILING", []):
+        lower, upper = bounds.get((dimension, stencil), (1, None))
+        if value > 0:
+            lower = max(lower, value + 1)
+        else:
+            upper = -value - 1 if upper is None else min(upper, -value - 1)
+        bounds[(dimension, stencil)] = (lower, upper)
+    return (dumps(settings, sort_keys=True, default=str),
+            tuple(sorted(set([tuple(x) for x in constraints.get("GROUPS", [])]))),
+            tuple(sorted(bounds.items())))
+
+def canonical_tiling(tiling):
+    """
+    return a hashable form of the tiling without the empty groups
+    """
+    groups = []
+    for group0 in tiling["GROUPS"]:
+        group = tuple([(tuple(x["STENCILS"]), x["NX"], x["NY"], x["NZ"])
+                       for x in group0["GROUPS"] if x["STENCILS"]])
+        if group:
+            groups.append(group)
+    return (tiling["NX"], tiling["NY"], tiling["NZ"], tuple(groups))
 
 # find optimal stencil program implementation variant
 def optimize_program(name, program):
     """
     find optimal implementation variant
     """
+    select_experiment(program.get("VARIANT", program["NAME"]))
     # analyze the stencil access pattern
     compute_dependencies(program)
     compute_sequence(program)
     compute_utilization(program)
     compute_domain(program)
+    settings = program.get("SOLVER", SOLVER)
+    method = settings.get("METHOD", "MILP")
+    # split the program into independent components unless the groups are fixed
+    if program.get("DECOMPOSE") is not None and method != "DP" and \
+       "GROUPS" not in program["CONSTRAINTS"]:
+        components = compute_components(program, program["DECOMPOSE"])
+        if len(components) > 1:
+            decompose_program(name, program, components, settings)
+            return
+    # optimize long sequences window by window
+    if program.get("WINDOW") is not None and method != "DP" and \
+       "GROUPS" not in program["CONSTRAINTS"] and program["WINDOW"] < len(program["SEQUENCE"]):
+        roll_program(name, program, program["WINDOW"], settings)
+        return
+    bound_program(program)
+    # run the heuristic only or use its result as mip start
+    if method in ("DP", "WARM"):
+        program["TELEMETRY"] = partition_program(program)
+        if method == "DP":
+            return
+        write_start(name, program)
     # generate and solve the linear program
     generate_lp(name, program)
-    solve_lp(name)
+    program["TELEMETRY"] = solve_lp(name, settings, method == "WARM", program["SCALE"])
     # analyze the program output
     parse_lp(name, program)
+    if settings.get("POOL") is not None:
+        program["POOL"] = parse_pool(name, program, settings["POOL"], settings.get("POOLGAP"))
@@ -0,0 +1,139 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module streams the variants through the optimization, generation, build, and run stages """
+
+from os import environ, sched_getaffinity, sched_setaffinity
+from queue import Queue
+from threading import Thread, Lock
+from subprocess import run, PIPE, STDOUT
+from multiprocessing import get_context
+from stencil_generator import generate_code, compile_experiment
+from stencil_profiler import PROFILE, merge_profiles, select_experiment
+
+# worker counts of the stages and capacity of the queues between the stages
+PIPELINE = {
+    "GENERATE" : 1,
+    "BUILD" : 2,
+    "RUN" : 1,
+    "QUEUE" : 4
+}
+
+def reserve_cores(cores):
+    """
+    return the cores reserved for the measurements and the cores of the other stages
+    """
+    available = sorted(sched_getaffinity(0))
+    # share the cores if the machine cannot isolate the measurements
+    if len(available) < 2 * cores:
+        return None, available
+    return available[-cores:], available[:-cores]
+
+def produce_variants(produce, channel):
+    """
+    optimize the variants and pass them to the pipeline followed by the optimizer profile
+    """
+    # the parent keeps the measurements taken before the fork
+    PROFILE["EXPERIMENTS"] = {}
+    try:
+        produce(lambda name, program: channel.put((name, program)))
+    finally:
+        channel.put(PROFILE["EXPERIMENTS"])
+        channel.put(None)
+
+def start_stage(stage, function, inbox, outbox, workers):
+    """
+    start the workers that apply the function to the variants of the inbox
+    """
+    def work():
+        """
+        process variants until the stage is closed
+        """
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            try:
+                function(*item)
+            except Exception as error:
+                # drop the failed variants from the following stages
+                print("-> " + stage.lower() + " failed for " + item[0] + ": " + str(error))
+                continue
+            if outbox is not None:
+                outbox.put(item)
+    threads = [Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def close_stage(threads, inbox):
+    """
+    wait until the workers of the stage processed all variants
+    """
+    for _ in threads:
+        inbox.put(None)
+    for thread in threads:
+        thread.join()
+
+# run the stages of all variants concurrently
+def run_pipeline(produce, folder, template, cores, output="output.txt"):
+    """
+    stream the variants emitted by the produce function through the stages and return them
+    """
+    reserved, others = reserve_cores(cores)
+    places = ",".join(["{" + str(x) + "}" for x in reserved]) if reserved else "cores"
+    environment = dict(environ, OMP_PLACES=places, OMP_PROC_BIND="close",
+                       OMP_NUM_THREADS=str(cores), OMP_STACKSIZE="128M")
+    print("-> pipeline measurement cores: " + (str(reserved) if reserved else "shared"))
+    lock = Lock()
+    with open(folder + output, "w"):
+        pass
+    def generate(name, program):
+        """
+        generate the code of the variant
+        """
+        generate_code(template, folder + name + ".cpp", program)
+    def build(name, program):
+        """
+        compile the variant
+        """
+        select_experiment(program.get("VARIANT", program["NAME"]))
+        assert compile_experiment(folder, name) == 0, "compilation failed"
+    def measure(name, _):
+        """
+        run the variant on the reserved cores and append its print outs to the output
+        """
+        pin = ["taskset", "-c", ",".join(map(str, reserved))] if reserved else []
+        result = run(pin + ["./" + name], cwd=folder, env=environment, stdout=PIPE, stderr=STDOUT)
+        with lock:
+            with open(folder + output, "a") as file:
+                file.write(result.stdout.decode())
+    # the optimization runs in a separate process since it redirects the standard output
+    affinity = sched_getaffinity(0)
+    sched_setaffinity(0, others)
+    context = get_context("fork")
+    channel = context.Queue(PIPELINE["QUEUE"])
+    producer = context.Process(target=produce_variants, args=(produce, channel))
+    producer.start()
+    queues = [Queue(PIPELINE["QUEUE"]) for _ in range(3)]
+    stages = [start_stage("GENERATE", generate, queues[0], queues[1], PIPELINE["GENERATE"]),
+              start_stage("BUILD", build, queues[1], queues[2], PIPELINE["BUILD"]),
+              start_stage("RUN", measure, queues[2], None, PIPELINE["RUN"])]
+    experiments = {}
+    try:
+        while True:
+            item = channel.get()
+            if item is None:
+                break
+            # merge the measurements of the optimization process
+            if isinstance(item, dict):
+                merge_profiles(item)
+                continue
+            name, program = item
+            experiments[name] = program
+            queues[0].put(item)
+        producer.join()
+        for threads, inbox in zip(stages, queues):
+            close_stage(threads, inbox)
+    finally:
+        sched_setaffinity(0, affinity)
+    return experiments
@@ -0,0 +1,157 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module measures the time spent in the phases of the optimization and code generation """
+
+from csv import writer
+from copy import deepcopy
+from json import dump
+from time import perf_counter
+from functools import wraps
+from threading import Lock, local
+from contextlib import contextmanager
+
+# profile of the current run (the measurements are disabled by default)
+PROFILE = {"ENABLED" : False, "EXPERIMENTS" : {}}
+# experiment name of the measurements outside of an experiment
+GLOBAL = "GLOBAL"
+# protect the measurements of concurrent solver runs
+LOCK = Lock()
+# stack of the active phases and current experiment per thread
+STACK = local()
+
+def enable_profiling():
+    """
+    enable the measurements and discard the previous profile
+    """
+    PROFILE["ENABLED"] = True
+    PROFILE["EXPERIMENTS"] = {}
+
+def select_experiment(experiment):
+    """
+    attribute the following measurements of the calling thread to the experiment
+    """
+    STACK.experiment = experiment
+
+def bind_experiment(function):
+    """
+    return the function attributing its measurements to the current experiment of the caller
+    """
+    experiment = getattr(STACK, "experiment", None)
+    def run(*arguments, **keywords):
+        """
+        run the function in the experiment of the caller
+        """
+        select_experiment(experiment)
+        return function(*arguments, **keywords)
+    return run
+
+def find_profile():
+    """
+    return the phases and counters of the current experiment
+    """
+    experiment = getattr(STACK, "experiment", None)
+    experiment = experiment if experiment is not None else GLOBAL
+    return PROFILE["EXPERIMENTS"].setdefault(experiment, {"PHASES" : {}, "COUNTERS" : {}})
+
+def count_metric(counter, value=1):
+    """
+    add the value to a counter of the current experiment
+    """
+    if not PROFILE["ENABLED"]:
+        return
+    with LOCK:
+        counters = find_profile()["COUNTERS"]
+        counters[counter] = counters.get(counter, 0) + value
+
+@contextmanager
+def measure_phase(phase):
+    """
+    measure the time of the enclosed code excluding the nested phases
+    """
+    if not PROFILE["ENABLED"]:
+        yield
+        return
+    if not hasattr(STACK, "phases"):
+        STACK.phases = []
+    frame = [perf_counter(), 0.0]
+    STACK.phases.append(frame)
+    try:
+        yield
+    finally:
+        STACK.phases.pop()
+        elapsed = perf_counter() - frame[0]
+        # the parent phase excludes the time of its children
+        if STACK.phases:
+            STACK.phases[-1][1] += elapsed
+        with LOCK:
+            phases = find_profile()["PHASES"]
+            entry = phases.setdefault(phase, {"TIME" : 0.0, "TOTAL" : 0.0, "COUNT" : 0})
+            entry["TIME"] += elapsed - frame[1]
+            entry["TOTAL"] += elapsed
+            entry["COUNT"] += 1
+
+def profile_phase(phase):
+    """
+    return a decorator that measures every call of the function
+    """
+    def decorate(function):
+        """
+        wrap the function with the measurement
+        """
+        @wraps(function)
+        def measure(*arguments, **keywords):
+            """
+            run the function in the phase
+            """
+            with measure_phase(phase):
+                return function(*arguments, **keywords)
+        return measure
+    return decorate
+
+def merge_profiles(experiments):
+    """
+    add the measurements of another process to the profile
+    """
+    with LOCK:
+        for experiment, profile in experiments.items():
+            target = PROFILE["EXPERIMENTS"].setdefault(experiment, {"PHASES" : {}, "COUNTERS" : {}})
+            for phase, entry in profile["PHASES"].items():
+                total = target["PHASES"].setdefault(phase, {"TIME" : 0.0, "TOTAL" : 0.0,
+                                                            "COUNT" : 0})
+                for key in total:
+                    total[key] += entry[key]
+            for counter, value in profile["COUNTERS"].items():
+                target["COUNTERS"][counter] = target["COUNTERS"].get(counter, 0) + value
+
+# copy the program configurations of the experiments
+copy_program = profile_phase("COPY")(deepcopy)
+
+# write the profile of all experiments
+def write_profiles(folder):
+    """
+    write the profile of every experiment and print and store the summary
+    """
+    if not PROFILE["ENABLED"]:
+        return
+    summary = {}
+    for experiment, profile in PROFILE["EXPERIMENTS"].items():
+        with open(folder + experiment + ".profile.json", "w") as file:
+            dump(profile, file, indent=4)
+        for phase, entry in profile["PHASES"].items():
+            total = summary.setdefault(phase, {"TIME" : 0.0, "COUNT" : 0})
+            total["TIME"] += entry["TIME"]
+            total["COUNT"] += entry["COUNT"]
+    # sort the phases by their exclusive time
+    elapsed = sum([x["TIME"] for x in summary.values()])
+    phases = sorted(summary.items(), key=lambda x: -x[1]["TIME"])
+    print("-> profile of " + str(len(PROFILE["EXPERIMENTS"])) + " experiments")
+    with open(folder + "profile.csv", "w") as file:
+        csv = writer(file, delimiter=",", quotechar="'", lineterminator="\n")
+        csv.writerow(["PHASE", "TIME", "COUNT", "SHARE"])
+        for phase, entry in phases:
+            share = entry["TIME"] / elapsed if elapsed > 0.0 else 0.0
+            csv.writerow([phase, "{0:.6f}".format(entry["TIME"]), str(entry["COUNT"]),
+                          "{0:.4f}".format(share)])
+            print("   - " + phase.lower().ljust(20) + "{0:10.3f}".format(entry["TIME"]) + " s" +
+                  "{0:8d}".format(entry["COUNT"]) + " calls" +
+                  "{0:8.1f}".format(100 * share) + " %")
@@ -0,0 +1,49 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module shares the immutable parts of the program configurations between the variants """
+
+from copy import deepcopy
+
+class FrozenDict(dict):
+    """
+    dictionary that cannot be modified and is shared instead of copied
+    """
+    __slots__ = ()
+
+    def modify(self, *arguments, **keywords):
+        """
+        reject the modification of the shared data
+        """
+        raise TypeError("the shared " + type(self).__name__ + " cannot be modified")
+
+    __setitem__ = __delitem__ = __ior__ = modify
+    clear = pop = popitem = setdefault = update = modify
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+def freeze(value):
+    """
+    return an immutable version of the nested dictionaries and lists
+    """
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict([(x, freeze(y)) for x, y in value.items()])
+    if isinstance(value, (list, tuple)):
+        return tuple([freeze(x) for x in value])
+    return value
+
+def derive_program(program):
+    """
+    return a view of the program with a private copy of the plan for the derived data
+    """
+    derived = dict(program)
+    derived["TILING"] = deepcopy(program["TILING"])
+    return derived
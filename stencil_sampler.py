@@ -0,0 +1,223 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module adaptively samples the training configurations of the performance model """
+
+import copy
+from math import log, sqrt
+from statistics import median
+from stencil_generator import generate_code, generate_script, generate_makefile, generate_sizes
+from stencil_generator import write_results, parse_results, run_experiments
+
+# constants
+Z_VALUE = 1.96
+
+def compute_candidates(families, xlens, ylens, zlens, low=500, high=2000):
+    """
+    return all training configurations with a total tile volume in the given range
+    """
+    candidates = []
+    for family in families:
+        for xlen in xlens:
+            for ylen in ylens:
+                for zlen in zlens:
+                    total = xlen * ylen * zlen
+                    if total >= low and total <= high:
+                        candidates.append((family, xlen, ylen, zlen))
+    return candidates
+
+def compute_distance(candidate1, candidate2):
+    """
+    return the distance of two configurations in the logarithmic size space
+    """
+    if candidate1[0] != candidate2[0]:
+        return float("inf")
+    return sqrt(sum([(log(x) - log(y))**2 for x, y in zip(candidate1[1:], candidate2[1:])]))
+
+def select_initial(candidates, count):
+    """
+    select a space-filling design with count configurations per family
+    """
+    selected = []
+    for family in sorted(set([x[0] for x in candidates])):
+        members = [x for x in candidates if x[0] == family]
+        # start with the configuration farthest from the center
+        center = [sum([log(x[dim]) for x in members]) / len(members) for dim in range(1, 4)]
+        first = max(members, key=lambda x: sum([(log(x[dim]) - center[dim - 1])**2
+                                                for dim in range(1, 4)]))
+        chosen = [first]
+        # add the configurations that maximize the minimal distance
+        while len(chosen) < min(count, len(members)):
+            remaining = [x for x in members if x not in chosen]
+            chosen.append(max(remaining, key=lambda x: min([compute_distance(x, y)
+                                                            for y in chosen])))
+        selected = selected + chosen
+    return selected
+
+def invert_matrix(matrix):
+    """
+    return the inverse of a square matrix using Gauss-Jordan elimination
+    """
+    size = len(matrix)
+    rows = [list(row) + [1.0 if x == y else 0.0 for y in range(size)]
+            for x, row in enumerate(matrix)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda x: abs(rows[x][col]))
+        assert rows[pivot][col] != 0.0, "singular training design"
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = rows[col][col]
+        rows[col] = [x / scale for x in rows[col]]
+        for row in range(size):
+            if row != col:
+                factor = rows[row][col]
+                rows[row] = [x - factor * y for x, y in zip(rows[row], rows[col])]
+    return [row[size:] for row in rows]
+
+def fit_model(samples, features):
+    """
+    fit the model coefficients to the median execution times using ordinary least squares
+    """
+    keys = sorted(samples.keys())
+    design = [features(*key) for key in keys]
+    values = [median(samples[key]) for key in keys]
+    size = len(design[0])
+    # scale the columns to improve the conditioning of the normal equations
+    scales = [max([abs(row[col]) for row in design]) or 1.0 for col in range(size)]
+    design = [[x / y for x, y in zip(row, scales)] for row in design]
+    gram = [[sum([row[x] * row[y] for row in design]) for y in range(size)] for x in range(size)]
+    inverse = invert_matrix(gram)
+    moments = [sum([row[x] * value for row, value in zip(design, values)]) for x in range(size)]
+    coefficients = [sum([inverse[x][y] * moments[y] for y in range(size)]) for x in range(size)]
+    # compute the residual variance per family and in total
+    residuals = dict([(key, value - sum([x * y for x, y in zip(row, coefficients)]))
+                      for key, row, value in zip(keys, design, values)])
+    freedom = max(1, len(keys) - size)
+    variance = sum([x**2 for x in residuals.values()]) / freedom
+    families = {}
+    for family in set([key[0] for key in keys]):
+        errors = [value for key, value in residuals.items() if key[0] == family]
+        families[family] = max(variance, sum([x**2 for x in errors]) / len(errors))
+    # compute the confidence intervals of the unscaled coefficients
+    intervals = [Z_VALUE * sqrt(max(0.0, variance * inverse[x][x])) / scales[x]
+                 for x in range(size)]
+    return {
+        "COEFFICIENTS" : [x / y for x, y in zip(coefficients, scales)],
+        "INTERVALS" : intervals,
+        "SCALES" : scales,
+        "INVERSE" : inverse,
+        "VARIANCE" : families
+    }
+
+def compute_leverage(model, row):
+    """
+    return the leverage of a configuration with respect to the current design
+    """
+    row = [x / y for x, y in zip(row, model["SCALES"])]
+    inverse = model["INVERSE"]
+    return sum([row[x] * inverse[x][y] * row[y]
+                for x in range(len(row)) for y in range(len(row))])
+
+def select_batch(candidates, samples, model, features, count):
+    """
+    select the configurations with the highest prediction variance
+    """
+    remaining = [x for x in candidates if x not in samples]
+    score = lambda x: model["VARIANCE"].get(x[0], 0.0) * compute_leverage(model, features(*x))
+    return sorted(remaining, key=score, reverse=True)[:count]
+
+def check_convergence(model, tolerance):
+    """
+    return true if the relative confidence intervals of all coefficients are below the tolerance
+    """
+    for coefficient, interval in zip(model["COEFFICIENTS"], model["INTERVALS"]):
+        if coefficient == 0.0 or interval / abs(coefficient) > tolerance:
+            return False
+    return True
+
+def sample_adaptive(candidates, features, measure, initial=4, batch=8, tolerance=0.05, limit=20):
+    """
+    sample training configurations until the coefficient confidence intervals converge
+    """
+    samples = {}
+    selected = select_initial(candidates, initial)
+    model = None
+    for step in range(limit):
+        # measure the selected configurations and refit the model
+        print("-> sampling batch " + str(step) + " with " + str(len(selected)) + " configurations")
+        for key, values in measure(selected, step).items():
+            samples[key] = samples.get(key, []) + values
+        model = fit_model(samples, features)
+        for coefficient, interval in zip(model["COEFFICIENTS"], model["INTERVALS"]):
+            print("   - coefficient " + str(coefficient) + " +/- " + str(interval))
+        if check_convergence(model, tolerance):
+            print("-> converged after " + str(len(samples)) + " configurations")
+            break
+        # select the next batch
+        selected = select_batch(candidates, samples, model, features, batch)
+        if not selected:
+            break
+    return model, samples
+
+def define_experiment(training, variant, xlen, ylen, zlen):
+    """
+    return the name and the program of a training configuration
+    """
+    cores = training["CORES"]
+    program = copy.deepcopy(training["PROGRAM"])
+    program["X"] = 2 * xlen
+    program["Y"] = 2 * ylen
+    program["Z"] = (5 * cores) * zlen
+    program["TILING"] = copy.deepcopy(training["TILING"])
+    program["STENCILS"] = copy.deepcopy(training["FAMILIES"][variant])
+    program["VARIANT"] = str(variant)
+    domain = str(program["X"]) + "x" + str(program["Y"]) + "x" + str(program["Z"])
+    return program["VARIANT"] + "-" + domain, program
+
+def define_sweep(training, variant, configurations):
+    """
+    return the name and the program of a sweep over the sizes of one family
+    """
+    sizes = [define_experiment(training, *x)[1] for x in configurations if x[0] == variant]
+    program = max(sizes, key=lambda x: x["X"] * x["Y"] * x["Z"])
+    program["SIZES"] = [[x["X"], x["Y"], x["Z"]] for x in sizes]
+    return program["VARIANT"] + "-sweep", program
+
+def measure_batch(training, configurations, step, folder, rows, generated):
+    """
+    build and run the configurations and return the measured times
+    """
+    cores = training["CORES"]
+    families = sorted(set([x[0] for x in configurations]))
+    experiments = dict([define_sweep(training, x, configurations) for x in families])
+    for name, experiment in experiments.items():
+        # the sweep binaries are independent of the sizes and only built once per family
+        if name not in generated:
+            generate_code("template_sweep.cpp", folder + name + ".cpp", experiment)
+            generated.add(name)
+        generate_sizes(folder + name + ".sizes", experiment["SIZES"])
+    generate_makefile(folder + "Makefile", experiments)
+    generate_script(folder + "run.sh", experiments, cores, 1)
+    output = "output" + str(step) + ".txt"
+    run_experiments(folder, "run.sh", output)
+    samples = {}
+    for row in parse_results(folder + output, 16):
+        key = (row[0], int(row[1]) // 2, int(row[2]) // 2, int(row[3]) // (5 * cores))
+        samples[key] = samples.get(key, []) + [float(row[4])]
+        rows.append(row)
+    return samples
+
+def sample_training(training, families, folder):
+    """
+    sample the training configurations of the families until the model coefficients converge
+    """
+    candidates = compute_candidates(families, training["XLENS"], training["YLENS"],
+                                    training["ZLENS"])
+    rows = []
+    generated = set([])
+    measure = lambda x, y: measure_batch(training, x, y, folder, rows, generated)
+    model, _ = sample_adaptive(candidates, training["FEATURES"], measure)
+    write_results(rows, folder + "results.csv")
+    # the sampling fits ordinary least squares while the R scripts fit least absolute deviations
+    print("-> least squares estimates (fit results.csv with the R script for the lad model)")
+    # scale the cost to account for the fact that we effectively update one tile per core
+    for name, value in zip(training["COEFFICIENTS"], model["COEFFICIENTS"]):
+        print(name + ": " + str(value / training["CORES"]))
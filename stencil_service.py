@@ -0,0 +1,178 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module serves optimization requests with warm caches in a long running process """
+
+import sys
+from os import path, remove
+from copy import deepcopy
+from json import loads, dumps
+from hashlib import sha1
+from getopt import getopt, GetoptError
+from threading import Lock, Event
+from socketserver import ThreadingUnixStreamServer, StreamRequestHandler
+from concurrent.futures import ProcessPoolExecutor
+from stencil_optimizer import optimize_program
+from stencil_generator import generate_code
+
+# number of requests served concurrently
+WORKERS = 2
+# maximal number of cached responses
+CAPACITY = 1024
+
+def start_worker():
+    """
+    redirect the log output of the worker to the standard error
+    """
+    sys.stdout = sys.stderr
+
+# optimize the program in a worker (the analyzed stencils and templates stay loaded)
+def serve_request(request, folder, key):
+    """
+    return the tiling of the program and its code if the request names a template
+    """
+    program = request["PROGRAM"]
+    name = folder + program["NAME"] + "-" + key[:12]
+    optimize_program(name, program)
+    assert "TILING" in program, "no feasible fusion and tiling"
+    response = {"TILING" : deepcopy(program["TILING"]), "OBJECTIVE" : program.get("OBJECTIVE"),
+                "TELEMETRY" : program.get("TELEMETRY")}
+    if request.get("TEMPLATE") is not None:
+        generate_code(request["TEMPLATE"], name + ".cpp", program)
+        with open(name + ".cpp") as file:
+            response["CODE"] = file.read()
+    return response
+
+def define_service(folder, workers):
+    """
+    return the worker pool and the caches of the service
+    """
+    return {"FOLDER" : folder, "LOCK" : Lock(), "CACHE" : {}, "PENDING" : {},
+            "EXECUTOR" : ProcessPoolExecutor(workers, initializer=start_worker)}
+
+def submit_request(service, line, respond):
+    """
+    pass the response to the request line to the respond function and return its completion
+    """
+    done = Event()
+    def complete(response):
+        """
+        send the response and signal the completion
+        """
+        respond(response)
+        done.set()
+    try:
+        request = loads(line)
+        key = dumps([request["PROGRAM"], request.get("TEMPLATE")], sort_keys=True)
+        key = sha1(key.encode()).hexdigest()
+    except (ValueError, KeyError, TypeError) as error:
+        complete({"ID" : None, "ERROR" : "invalid request " + str(error)})
+        return done
+    ident = request.get("ID")
+    # answer repeated requests from the cache and share the pending ones
+    with service["LOCK"]:
+        cached = service["CACHE"].get(key)
+        future = service["PENDING"].get(key)
+        if cached is None and future is None:
+            future = service["EXECUTOR"].submit(serve_request, request, service["FOLDER"], key)
+            service["PENDING"][key] = future
+    if cached is not None:
+        complete(dict(cached, ID=ident, CACHED=True))
+        return done
+    def store(future):
+        """
+        cache the response of the worker and send it
+        """
+        try:
+            response = future.result()
+        except Exception as error:
+            with service["LOCK"]:
+                service["PENDING"].pop(key, None)
+            complete({"ID" : ident, "ERROR" : type(error).__name__ + ": " + str(error)})
+            return
+        # move the response from the pending to the cached requests at once
+        with service["LOCK"]:
+            service["PENDING"].pop(key, None)
+            service["CACHE"][key] = response
+            # evict the oldest responses
+            while len(service["CACHE"]) > CAPACITY:
+                service["CACHE"].pop(next(iter(service["CACHE"])))
+        complete(dict(response, ID=ident, CACHED=False))
+    future.add_done_callback(store)
+    return done
+
+def serve_stream(service, infile, outfile):
+    """
+    answer the json requests of the input lines with json response lines
+    """
+    lock = Lock()
+    def respond(response):
+        """
+        write a response line
+        """
+        with lock:
+            outfile.write(dumps(response) + "\n")
+            outfile.flush()
+    pending = [submit_request(service, x, respond) for x in infile if x.strip()]
+    for done in pending:
+        done.wait()
+
+class RequestHandler(StreamRequestHandler):
+    """
+    answer the requests of a socket connection
+    """
+    def handle(self):
+        """
+        serve the request lines of the connection
+        """
+        lines = (x.decode() for x in self.rfile)
+        serve_stream(self.server.service, lines, self)
+
+    def write(self, text):
+        """
+        write a response to the connection
+        """
+        self.wfile.write(text.encode())
+
+    def flush(self):
+        """
+        flush the responses of the connection
+        """
+        self.wfile.flush()
+
+# the main program
+def main(arguments):
+    """ main method used to run the service """
+    workers = WORKERS
+    socket = None
+    folder = "./"
+    try:
+        opts, _ = getopt(arguments, "w:s:f:", ["workers=", "socket=", "folder="])
+    except GetoptError:
+        print("stencil_service.py -w <workers> -s <socket> -f <folder>")
+        exit(2)
+    for opt, arg in opts:
+        if opt in ("-w", "--workers"):
+            workers = int(arg)
+        elif opt in ("-s", "--socket"):
+            socket = arg
+        elif opt in ("-f", "--folder"):
+            folder = path.normpath(arg) + "/"
+    # keep the standard output for the responses
+    output = sys.stdout
+    sys.stdout = sys.stderr
+    print("-> working dir: " + folder)
+    print("-> workers: " + str(workers))
+    print("-> socket: " + str(socket))
+    service = define_service(folder, workers)
+    if socket is None:
+        serve_stream(service, sys.stdin, output)
+    else:
+        if path.exists(socket):
+            remove(socket)
+        with ThreadingUnixStreamServer(socket, RequestHandler) as server:
+            server.service = service
+            server.serve_forever()
+    service["EXECUTOR"].shutdown()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
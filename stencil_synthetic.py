@@ -0,0 +1,107 @@
+# Copyright (c) 2019, ETH Zurich
+
+""" this module generates synthetic stencil programs to benchmark the optimizer """
+
+from copy import deepcopy
+from random import Random
+
+# supported dependency graph shapes
+SHAPES = ["CHAIN", "TREE", "DIAMOND", "FANIN"]
+# number of producers reduced by one stencil of the fan-in shape
+WIDTH = 4
+
+# synthetic stencil program configuration (machine and model parameters of the examples)
+PROGRAM = {
+    "CONSTANTS" : [],
+    "MACHINE" : {"CORES" : 4, "CAPACITY" : 85*1024},
+    "MEMORY" : {"RW BODY" : -2.23e-7, "ST BODY": 5.71e-7, "RW PEEL" : -1.25e-6, "ST PEEL" : 5.25e-6},
+    "CACHE" : {"BODY" : 9.44e-8, "PEEL" : 9.95e-7},
+    "OVERLAP" : 1.0,
+    "SLACK" : {"SIZE" : 0.02, "CORES" : 0.05},
+    "SOLVER" : {"MIPGAP" : None, "TIMELIMIT" : None, "THREADS" : None, "EMPHASIS" : None,
+               "NODELIMIT" : None, "POOL" : None, "POOLGAP" : None, "METHOD" : "MILP"},
+    "CONSTRAINTS": {},
+    "COUNTS" : "BINARY",
+    "X" : 64,
+    "Y" : 64,
+    "Z" : 60,
+    "RUNS" : 64,
+    "VERIFY" : False,
+    "FLUSH" : True
+}
+
+def compute_producers(shape, count):
+    """
+    return the producers of every stencil for the given dependency graph shape
+    """
+    producers = []
+    for index in range(count):
+        if index == 0:
+            producers.append([])
+        elif shape == "CHAIN":
+            producers.append([index - 1])
+        elif shape == "TREE":
+            # every stencil consumes its parent of a binary out-tree
+            producers.append([(index - 1) // 2])
+        elif shape == "DIAMOND":
+            # the branches consume the source and the join consumes both branches
+            position = index % 3
+            producers.append([index - position] if position else [index - 2, index - 1])
+        elif shape == "FANIN":
+            # every stencil after a block of producers reduces the block
+            block = index % (WIDTH + 1)
+            producers.append(list(range(index - WIDTH, index)) if block == WIDTH else [])
+        else:
+            assert False, "unknown dependency graph shape " + shape
+    return producers
+
+def define_access(name, dim, offset):
+    """
+    return the access of the array shifted by the offset in the given dimension
+    """
+    indexes = ["i", "j", "k"]
+    if offset != 0:
+        indexes[dim] += ("+" if offset > 0 else "-") + str(abs(offset))
+    return name + "(" + ",".join(indexes) + ")"
+
+def define_stencil(generator, arrays, halo):
+    """
+    return a stencil that averages the arrays with random star shaped access patterns
+    """
+    terms = []
+    for name in arrays:
+        terms.append(define_access(name, 0, 0))
+        # access a random dimension with a random radius
+        dim = generator.randrange(3)
+        radius = generator.randint(1, halo) if halo > 0 else 0
+        if radius > 0:
+            terms.append(define_access(name, dim, radius))
+            terms.append(define_access(name, dim, -radius))
+    weight = "{0:.4f}".format(1.0 / len(terms))
+    return "auto res = " + weight + " * (" + " + ".join(terms) + ");"
+
+# generate a synthetic stencil program
+def define_program(shape, count, fields=4, reads=1, halo=1, seed=0):
+    """
+    return a program with count stencils that read reads of the fields and their producers
+    """
+    generator = Random(seed)
+    producers = compute_producers(shape, count)
+    names = ["s" + str(x) for x in range(count)]
+    inputs = ["f" + str(x) for x in range(fields)]
+    stencils = {}
+    for index, name in enumerate(names):
+        arrays = [names[x] for x in producers[index]]
+        arrays += generator.sample(inputs, min(reads, fields))
+        stencils[name] = define_stencil(generator, arrays, halo)
+    # the stencils without consumers are the outputs
+    consumed = set([x for y in producers for x in y])
+    program = deepcopy(PROGRAM)
+    program["NAME"] = shape.lower() + "-" + str(count)
+    program["STENCILS"] = stencils
+    program["SEQUENCE"] = names
+    program["OUTPUTS"] = [x for index, x in enumerate(names) if index not in consumed]
+    program["HX"] = max(1, halo)
+    program["HY"] = max(1, halo)
+    program["HZ"] = max(1, halo)
+    return program
@@ -3,6 +3,9 @@
  */
 
 #include <cassert>
+#include <cstdlib>
+#include <cstdint>
+#include <new>
 #include <iostream>
 #include <vector>
 #include <array>
@@ -24,6 +27,17 @@ constexpr int NX = {{TILING.NX}};
 constexpr int NY = {{TILING.NY}}; 
 constexpr int NZ = {{TILING.NZ}}; 
 
+// padded array layout (the rows and the first value inside the halo are aligned)
+constexpr int ALIGN = {{TILING.LAYOUT.ALIGN}};
+constexpr int OFFSET = {{TILING.LAYOUT.OFFSET}};
+
+// store rectangular range
+struct loop_info {
+    int ibeg; int iend;
+    int jbeg; int jend;
+    int kbeg; int kend;
+};
+
 // implement infrastructure
 template<typename T>
 class directory {
@@ -41,68 +55,127 @@ private:
     std::array<T, 27> _mem; 
 };
 
-template<typename T, int VX, int VY, int VZ>
+template<typename T, int VX, int VY, int VZ, int PX, int PY>
 class array_view {
 public:
     array_view(T* mem) : _mem(mem) {}
 
     T& operator()(int i, int j, int k) { 
-        return _mem[i + j * (VX + 2*HX) + k * (VX + 2*HX) * (VY + 2*HY)]; 
+        return _mem[i + j * PX + k * PY]; 
     }
     const T& operator()(int i, int j, int k) const { 
-        return _mem[i + j * (VX + 2*HX) + k * (VX + 2*HX) * (VY + 2*HY)]; 
+        return _mem[i + j * PX + k * PY]; 
     }
 private:
     T* _mem;
 };
 
-template<typename T, int VX, int VY, int VZ>
+// return a random number in [0, 1) that only depends on the seed and the index (splitmix64)
+inline double random_value(uint64_t seed, uint64_t index) {
+    uint64_t z = seed * 0x9E3779B97F4A7C15ull + index;
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ull;
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBull;
+    z = z ^ (z >> 31);
+    return (z >> 11) * (1.0 / 9007199254740992.0);
+}
+
+template<typename T, int VX, int VY, int VZ, int PX, int PY>
 class array {
 public:
-    array() : _mem((VX + 2*HX) * (VY + 2*HY) * (VZ + 2*HZ)) { 
-        std::generate(std::begin(_mem), std::end(_mem), std::rand); 
-    }
-    array(T value) : _mem((VX + 2*HX) * (VY + 2*HY) * (VZ + 2*HZ)) { 
-        std::generate(std::begin(_mem), std::end(_mem), [=]() { return value; }); 
+    // the pages are mapped by the first initialization of the values
+    array() : _base(allocate()), _mem(_base + OFFSET) {}
+    array(T value) : _base(allocate()), _mem(_base + OFFSET) { 
+        #pragma omp parallel for schedule(static)
+        for(int k = 0; k < VZ + 2*HZ; ++k)
+            fill({0, VX + 2*HX, 0, VY + 2*HY, k, k + 1}, value);
     }
+    ~array() { free(_base); }
+    array(const array&) = delete;
+    array& operator=(const array&) = delete;
 
     T& operator()(int i, int j, int k) { 
-        return _mem[i + j * (VX + 2*HX) + k * (VX + 2*HX) * (VY + 2*HY)]; 
+        return _mem[i + j * PX + k * PY]; 
     }
     const T& operator()(int i, int j, int k) const { 
-        return _mem[i + j * (VX + 2*HX) + k * (VX + 2*HX) * (VY + 2*HY)]; 
+        return _mem[i + j * PX + k * PY]; 
     }
 
-    size_t size() const { return _mem.size(); }
+    // set the values of a box
+    void fill(const loop_info& box, T value) {
+        for(int k = box.kbeg; k < box.kend; ++k)
+            for(int j = box.jbeg; j < box.jend; ++j)
+                for(int i = box.ibeg; i < box.iend; ++i)
+                    (*this)(i, j, k) = value;
+    }
+    // set the values of a box to random numbers independent of the thread count
+    void randomize(const loop_info& box, uint64_t seed) {
+        for(int k = box.kbeg; k < box.kend; ++k)
+            for(int j = box.jbeg; j < box.jend; ++j)
+                for(int i = box.ibeg; i < box.iend; ++i)
+                    (*this)(i, j, k) = random_value(seed, i + (VX + 2*HX) * (j + (VY + 2*HY) * k));
+    }
+
+    size_t size() const { return SIZE; }
 private:
-    std::vector<T> _mem;
+    static constexpr size_t SIZE = OFFSET + static_cast<size_t>(PY) * (VZ + 2*HZ);
+    static T* allocate() {
+        void* mem = nullptr;
+        if(posix_memalign(&mem, ALIGN * sizeof(T), SIZE * sizeof(T)))
+            throw std::bad_alloc();
+        return static_cast<T*>(mem);
+    }
+
+    T* _base;
+    T* _mem;
 };
 
-template<typename T, int VX, int VY, int VZ>
-class stack_array {
+// per thread scratch memory of the tile temporaries
+class scratch_arena {
 public:
-    T& operator()(int i, int j, int k) { 
-        return _mem[i + j * (VX + 2*HX) + k * (VX + 2*HX) * (VY + 2*HY)]; 
-    }
-    const T& operator()(int i, int j, int k) const { 
-        return _mem[i + j * (VX + 2*HX) + k * (VX + 2*HX) * (VY + 2*HY)]; 
+    // align the thread memory and the temporaries like the arrays
+    static constexpr size_t LINE = ALIGN;
+
+    scratch_arena(int threads, size_t size) : _size((size + LINE - 1) / LINE * LINE) {
+        void* mem = nullptr;
+        if(posix_memalign(&mem, LINE * sizeof(double), std::max(threads * _size, static_cast<size_t>(LINE)) * sizeof(double)))
+            throw std::bad_alloc();
+        _mem = static_cast<double*>(mem);
+        // every thread touches its own memory first
+        #pragma omp parallel
+        {
+            double* data = _mem + omp_get_thread_num() * _size;
+            std::fill(data, data + _size, 0.0);
+        }
     }
+    ~scratch_arena() { free(_mem); }
+    scratch_arena(const scratch_arena&) = delete;
+    scratch_arena& operator=(const scratch_arena&) = delete;
 
-    size_t size() const { return _mem.size(); }
+    double* data(int thread) { return _mem + thread * _size; }
 private:
-    std::array<T, (VX + 2*HX) * (VY + 2*HY) * (VZ + 2*HZ)> _mem;
+    size_t _size;
+    double* _mem;
 };
 
-// define the array types
-typedef array<double, X, Y, Z> array_3d;
-typedef array_view<double, X, Y, Z> array_view_3d;
+// map a tile boundary of the rank local domain to the array including the halos
+inline int touch_bound(int value, int size, int offset, int extent) {
+    return value <= 0 ? 0 : (value >= size ? extent : offset + value);
+}
 
-// store rectangular range
-struct loop_info {
-    int ibeg; int iend;
-    int jbeg; int jend;
-    int kbeg; int kend;
-};
+// return the view of a tile temporary that starts at the given scratch memory
+template<typename TView>
+TView make_view(double* mem) {
+    return TView(&TView(mem + OFFSET)(HX, HY, HZ));
+}
+constexpr size_t max_size(size_t value) { return value; }
+template<typename... TArgs>
+constexpr size_t max_size(size_t value, TArgs... args) {
+    return value > max_size(args...) ? value : max_size(args...);
+}
+
+// define the array types
+typedef array<double, X, Y, Z, {{TILING.LAYOUT.ARRAY[0]}}, {{TILING.LAYOUT.ARRAY[1]}}> array_3d;
+typedef array_view<double, X, Y, Z, {{TILING.LAYOUT.ARRAY[0]}}, {{TILING.LAYOUT.ARRAY[1]}}> array_view_3d;
 
 // logging helpers
 void print() { 
@@ -131,7 +204,41 @@ auto update_timers(T& start, TArgs&... args)
     (void) std::initializer_list<int>{(args += diff, 0)...};
     return stop;
 }
-
+template<typename T>
+double elapsed_time(const T& start) {
+    auto stop = std::chrono::high_resolution_clock::now();
+    return std::chrono::duration<double, std::milli>(stop - start).count();
+}
+{% if ADAPTIVE %}
+// statistics helpers
+double compute_median(std::vector<double> samples) {
+    std::sort(samples.begin(), samples.end());
+    int size = samples.size();
+    return 0.5 * (samples[(size - 1) / 2] + samples[size / 2]);
+}
+// compute the nonparametric confidence interval of the median (see SPCL_Stats.R)
+bool compute_interval(std::vector<double> samples, double& low, double& high) {
+    std::sort(samples.begin(), samples.end());
+    double size = samples.size();
+    int lrank = std::floor((size - {{ADAPTIVE.LEVEL}} * std::sqrt(size)) / 2.0);
+    int hrank = std::ceil(1.0 + (size + {{ADAPTIVE.LEVEL}} * std::sqrt(size)) / 2.0);
+    // the ranks are one-based and only valid for enough samples
+    if(lrank < 1 || hrank > static_cast<int>(samples.size()))
+        return false;
+    low = samples[lrank - 1];
+    high = samples[hrank - 1];
+    return true;
+}
+// check if the medians of the last two windows agree within the target width
+bool check_steady(const std::vector<double>& samples, int window, double width) {
+    if(static_cast<int>(samples.size()) < 2 * window)
+        return false;
+    std::vector<double> last(samples.end() - window, samples.end());
+    std::vector<double> prev(samples.end() - 2 * window, samples.end() - window);
+    double median = compute_median(last);
+    return std::fabs(median - compute_median(prev)) <= width * median;
+}
+{% endif %}
 // apply periodic boundary condition
 template<typename TArray>
 void make_periodic(TArray& data) {
@@ -176,12 +283,54 @@ void compute_reference(
     make_periodic({{stencil.NAME}});{% endfor %}{% endfor %}{% endfor %}
 }
 
+{# apply the stencils of a group with the loop bounds of the inner or of any tile #}{% macro apply_stencils(group1, inner) %}{% for stencil in group1.STENCILS %}
+                {
+                    // apply {{stencil.NAME}} stencil{% if inner %}{% set bounds1 = group1.LOOPS[stencil.NAME] %}
+                    constexpr int ibeg = {{bounds1[0][0]}};
+                    constexpr int iend = TX{{group1.ID}} + ({{bounds1[0][1]}});
+                    constexpr int jbeg = {{bounds1[1][0]}};
+                    constexpr int jend = TY{{group1.ID}} + ({{bounds1[1][1]}});
+                    constexpr int kbeg = {{bounds1[2][0]}};
+                    constexpr int kend = TZ{{group1.ID}} + ({{bounds1[2][1]}});{% else %}
+                    int ibeg = _loops_{{stencil.NAME}}[idx].ibeg;
+                    int iend = _loops_{{stencil.NAME}}[idx].iend;
+                    int jbeg = _loops_{{stencil.NAME}}[idx].jbeg;
+                    int jend = _loops_{{stencil.NAME}}[idx].jend;
+                    int kbeg = _loops_{{stencil.NAME}}[idx].kbeg;
+                    int kend = _loops_{{stencil.NAME}}[idx].kend;{% endif %}
+
+                    for(int k = kbeg; k < kend; ++k)
+                        for(int j = jbeg; j < jend; ++j)
+                            #pragma omp simd
+                            for(int i = ibeg; i < iend; ++i) {
+                                assert(i >= -HX && i < TX{{group1.ID}} + HX);
+                                assert(j >= -HY && j < TY{{group1.ID}} + HY);
+                                assert(k >= -HZ && k < TZ{{group1.ID}} + HZ);
+
+                                {{stencil.LAMBDA}}
+                                {{stencil.NAME}}(i, j, k) = res;           
+                            } 
+                }{% endfor %}{% endmacro %}
+{# apply the stencils of a group to a single tile #}{% macro apply_tile(group1) %}// initialize array views
+            loop_info tile = _tiles_group{{group1.ID}}[idx]; 
+            {% for input in group1.INPUTS %}{% if input in TILING.INPUTS %}
+            array_view_3d {{input}}(&__{{input}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% else %}
+            sarray_view_3d {{input}}(&__{{input}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% endif %}{% endfor %}{% for output in group1.OUTPUTS %}{% if output in TILING.OUTPUTS %}
+            array_view_3d {{output}}(&__{{output}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% else %}
+            sarray_view_3d {{output}}(&__{{output}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% endif %}{% endfor %}
+            {% if group1.TEMPS %}
+            double* ___scratch = _scratch.data(omp_get_thread_num()); {% endif %}{% for temp in group1.TEMPS %}
+            tarray{{group1.ID}}_view_3d {{temp}}(make_view<tarray{{group1.ID}}_view_3d>(___scratch + {{group1.SLOTS[temp]}} * TS{{group1.ID}})); {% endfor %}
+            // dispatch the inner tiles to the loops with compile-time bounds
+            if(_inner_group{{group1.ID}}[idx]) { {{ apply_stencils(group1, True) }}
+            } else { {{ apply_stencils(group1, False) }}
+            }{% endmacro %}
 int main(int argc, char **argv) {
     // print the configuration
     log("-> configuration");
     log("   - variant {{VARIANT}}");
     log("   - domain {{X}}, {{Y}}, {{Z}}");
-    log("   - runs {{RUNS}}");
+    log("   - runs {% if ADAPTIVE %}adaptive{% else %}{{RUNS}}{% endif %}");
     log("   - verify {{VERIFY}}");
     log("   - threads ", omp_get_max_threads());
     
@@ -202,26 +351,28 @@ int main(int argc, char **argv) {
     int yend = std::min(std::max(HY + OY + (index[1] + 1) * SY, HY), Y + HY);  
     int zend = std::min(std::max(HZ + OZ + (index[2] + 1) * SZ, HZ), Z + HZ);  
 
-    typedef array<double, SX, SY, SZ> sarray_3d;
-    typedef array_view<double, SX, SY, SZ> sarray_view_3d;
+    typedef array<double, SX, SY, SZ, {{TILING.LAYOUT.SUBDOMAIN[0]}}, {{TILING.LAYOUT.SUBDOMAIN[1]}}> sarray_3d;
+    typedef array_view<double, SX, SY, SZ, {{TILING.LAYOUT.SUBDOMAIN[0]}}, {{TILING.LAYOUT.SUBDOMAIN[1]}}> sarray_view_3d;
 
-    // allocate the input and output arrays and views of the rank local data
-    std::srand(0); {% for input in TILING.INPUTS %}
+    // allocate the arrays (the first group initializes them) and views of the rank local data
+    {% for input in TILING.INPUTS %}
     array_3d _{{input}}; {% endfor %}{% for output in TILING.OUTPUTS %}
-    array_3d _{{output}}(0.0); {% endfor %}{% for temp in TILING.TEMPS %}
-    sarray_3d _{{temp}}(0.0); {% endfor %}{% for group0 in TILING.GROUPS %}{% for temp in group0.TEMPS %}
-    sarray_3d _{{temp}}(0.0); {% endfor %}{% for group1 in group0.GROUPS %}{% for temp in group1.TEMPS %}
-    sarray_3d _{{temp}}(0.0); {% endfor %}{% endfor %}{% endfor %}{% for input in TILING.INPUTS %}
+    array_3d _{{output}}{% if output not in TILING.TOUCH %}(0.0){% endif %}; {% endfor %}{% for temp in TILING.TEMPS %}
+    sarray_3d _{{temp}}{% if temp not in TILING.TOUCH %}(0.0){% endif %}; {% endfor %}{% for group0 in TILING.GROUPS %}{% for temp in group0.TEMPS %}
+    sarray_3d _{{temp}}{% if temp not in TILING.TOUCH %}(0.0){% endif %}; {% endfor %}{% for group1 in group0.GROUPS %}{% for temp in group1.TEMPS %}
+    sarray_3d _{{temp}}{% if temp not in TILING.TOUCH %}(0.0){% endif %}; {% endfor %}{% endfor %}{% endfor %}{% for input in TILING.INPUTS %}
     array_view_3d __{{input}}(&(_{{input}}(xbeg, ybeg, zbeg))); {% endfor %}{% for output in TILING.OUTPUTS %}
     array_view_3d __{{output}}(&(_{{output}}(xbeg, ybeg, zbeg))); {% endfor %}{% for temp in TILING.TEMPS %}
     sarray_view_3d __{{temp}}(&(_{{temp}}(HX, HY, HZ))); {% endfor %}{% for group0 in TILING.GROUPS %}{% for temp in group0.TEMPS %}
     sarray_view_3d __{{temp}}(&(_{{temp}}(HX, HY, HZ))); {% endfor %}{% for group1 in group0.GROUPS %}{% for temp in group1.TEMPS %}
     sarray_view_3d __{{temp}}(&(_{{temp}}(HX, HY, HZ))); {% endfor %}{% endfor %}{% endfor %}
-    {% for input in TILING.INPUTS %}
-    make_periodic(_{{input}}); {% endfor %}
     
     log("-> preparing loops..."); {% for group0 in TILING.GROUPS if group0.LOOPS %}{% for group1 in group0.GROUPS if group1.LOOPS %}
-    std::vector<loop_info> _tiles_group{{group1.ID}}; {% endfor %}{% endfor %}{% for group0 in TILING.GROUPS if group0.LOOPS %}{% for group1 in group0.GROUPS if group1.LOOPS %}{% for name, bounds in group1.LOOPS.items() %}
+    std::vector<loop_info> _tiles_group{{group1.ID}}; 
+    std::vector<loop_info> _touch_group{{group1.ID}}; 
+    std::vector<int> _interior_group{{group1.ID}}; 
+    std::vector<int> _boundary_group{{group1.ID}}; 
+    std::vector<char> _inner_group{{group1.ID}}; {% endfor %}{% endfor %}{% for group0 in TILING.GROUPS if group0.LOOPS %}{% for group1 in group0.GROUPS if group1.LOOPS %}{% for name, bounds in group1.LOOPS.items() %}
     std::vector<loop_info> _loops_{{name}}; {% endfor %}{% endfor %}{% endfor %}
     {% for group0 in TILING.GROUPS if group0.LOOPS %}{% for group1 in group0.GROUPS if group1.LOOPS %}
     // compute group{{group1.ID}} tile size
@@ -232,9 +383,10 @@ int main(int argc, char **argv) {
     constexpr int OY{{group1.ID}} = -(TY{{group1.ID}} * {{group1.NY}} - SY) / 2;
     constexpr int OZ{{group1.ID}} = -(TZ{{group1.ID}} * {{group1.NZ}} - SZ) / 2;
 
-    // define group{{group1.ID}} array types
-    typedef stack_array<double, TX{{group1.ID}}, TY{{group1.ID}}, TZ{{group1.ID}}> tarray{{group1.ID}}_3d;
-    typedef array_view<double, TX{{group1.ID}}, TY{{group1.ID}}, TZ{{group1.ID}}> tarray{{group1.ID}}_view_3d;
+    // define group{{group1.ID}} array types and the scratch memory of its temporaries
+    typedef array_view<double, TX{{group1.ID}}, TY{{group1.ID}}, TZ{{group1.ID}}, {{group1.PITCH[0]}}, {{group1.PITCH[1]}}> tarray{{group1.ID}}_view_3d;
+    constexpr size_t TS{{group1.ID}} = (OFFSET + {{group1.PITCH[1]}} * (TZ{{group1.ID}} + 2*HZ) +
+        scratch_arena::LINE - 1) / scratch_arena::LINE * scratch_arena::LINE;
  
     // compute group{{group1.ID}} tile loops and offsets
     for(int z = 0; z < {{group1.NZ}}; ++z)
@@ -246,6 +398,13 @@ int main(int argc, char **argv) {
                     z * TZ{{group1.ID}} + OZ{{group1.ID}}, (z + 1) * TZ{{group1.ID}} + OZ{{group1.ID}}
                 };
                 _tiles_group{{group1.ID}}.push_back(tile);
+                bool inner = true;
+                // extend the outer tiles to the array boundaries
+                _touch_group{{group1.ID}}.push_back({
+                    touch_bound(tile.ibeg, xend - xbeg, xbeg, X + 2*HX), touch_bound(tile.iend, xend - xbeg, xbeg, X + 2*HX),
+                    touch_bound(tile.jbeg, yend - ybeg, ybeg, Y + 2*HY), touch_bound(tile.jend, yend - ybeg, ybeg, Y + 2*HY),
+                    touch_bound(tile.kbeg, zend - zbeg, zbeg, Z + 2*HZ), touch_bound(tile.kend, zend - zbeg, zbeg, Z + 2*HZ)
+                });
                 {% for name, bounds1 in group1.LOOPS.items() %}{% set bounds0 = group0.LOOPS[name] %}
                 // compute loop boundary of inner tiles
                 loop_info loop_{{name}} = {
@@ -269,10 +428,45 @@ int main(int argc, char **argv) {
                 loop_{{name}}.jend -= tile.jbeg;
                 loop_{{name}}.kbeg -= tile.kbeg; 
                 loop_{{name}}.kend -= tile.kbeg;
+
+                // check if the loop matches the compile-time bounds of the inner tiles
+                inner = inner &&
+                    loop_{{name}}.ibeg == {{bounds1[0][0]}} && loop_{{name}}.iend == TX{{group1.ID}} + ({{bounds1[0][1]}}) &&
+                    loop_{{name}}.jbeg == {{bounds1[1][0]}} && loop_{{name}}.jend == TY{{group1.ID}} + ({{bounds1[1][1]}}) &&
+                    loop_{{name}}.kbeg == {{bounds1[2][0]}} && loop_{{name}}.kend == TZ{{group1.ID}} + ({{bounds1[2][1]}});
                 
                 _loops_{{name}}.push_back(loop_{{name}}); 
                 {% endfor %}
+                _inner_group{{group1.ID}}.push_back(inner);
+                // classify the tiles that do not access the boundaries
+                bool interior = true; {% for stencil in group1.STENCILS %}{% for name, offsets in stencil.OFFSETS.items() if name not in group1.TEMPS %}
+                interior = interior &&
+                    tile.ibeg + loop_{{stencil.NAME}}.ibeg + ({{offsets[0][0]}}) >= 0 && tile.ibeg + loop_{{stencil.NAME}}.iend + ({{offsets[0][1]}}) <= xend - xbeg &&
+                    tile.jbeg + loop_{{stencil.NAME}}.jbeg + ({{offsets[1][0]}}) >= 0 && tile.jbeg + loop_{{stencil.NAME}}.jend + ({{offsets[1][1]}}) <= yend - ybeg &&
+                    tile.kbeg + loop_{{stencil.NAME}}.kbeg + ({{offsets[2][0]}}) >= 0 && tile.kbeg + loop_{{stencil.NAME}}.kend + ({{offsets[2][1]}}) <= zend - zbeg; {% endfor %}{% endfor %}
+                if(interior)
+                    _interior_group{{group1.ID}}.push_back(_tiles_group{{group1.ID}}.size() - 1);
+                else
+                    _boundary_group{{group1.ID}}.push_back(_tiles_group{{group1.ID}}.size() - 1);
             } {% endfor %}{% endfor %}
+
+    // allocate the scratch memory of the temporaries of all groups once per thread
+    constexpr size_t SCRATCH = max_size(0{% for group0 in TILING.GROUPS if group0.LOOPS %}{% for group1 in group0.GROUPS if group1.LOOPS %}, 
+        {{group1.SCRATCH}} * TS{{group1.ID}}{% endfor %}{% endfor %});
+    scratch_arena _scratch(omp_get_max_threads(), SCRATCH);
+
+    // first touch the arrays in parallel with the tile to thread mapping of their first group
+    log("-> initializing arrays..."); {% for group0 in TILING.GROUPS %}{% for group1 in group0.GROUPS if group1.LOOPS %}{% for name, group in TILING.TOUCH.items() if group == group1.ID %}{% set touch %}{% if name in TILING.INPUTS %}_{{name}}.randomize(_touch_group{{group}}[idx], {{TILING.INPUTS.index(name) + 1}});{% else %}_{{name}}.fill(_touch_group{{group}}[idx], 0.0);{% endif %}{% endset %}{% if group1.OVERLAP %}{% for tiles in ["interior", "boundary"] %}
+    #pragma omp parallel for schedule(static)
+    for(int tdx = 0; tdx < static_cast<int>(_{{tiles}}_group{{group}}.size()); ++tdx) { 
+        int idx = _{{tiles}}_group{{group}}[tdx]; 
+        {{touch}}
+    } {% endfor %}{% else %}
+    #pragma omp parallel for schedule(static)
+    for(int idx = 0; idx < static_cast<int>(_touch_group{{group}}.size()); ++idx) 
+        {{touch}} {% endif %}{% endfor %}{% endfor %}{% endfor %}
+    {% for input in TILING.INPUTS %}
+    make_periodic(_{{input}}); {% endfor %}
     {% if VERIFY %}
     // run the sequential stencil program to prepare the verification
     log("-> computing reference..."); {% for output in TILING.OUTPUTS %}
@@ -282,8 +476,13 @@ int main(int argc, char **argv) {
         {% for output in TILING.OUTPUTS %}_exp_{{output}}{% if not loop.last %}, {% endif %}{% endfor %}); {% endif %}
 
     // define timing variables
-    double total_time, halo_time;
-    for(int run = 0; run < 2 * {{RUNS}}; ++run) {
+    double total_time, halo_time;{% if ADAPTIVE %}
+    // sample until the median confidence interval is narrow or the time budget is spent
+    std::vector<double> warmup, samples;
+    double low = 0.0, high = 0.0;
+    auto budget = std::chrono::high_resolution_clock::now();
+    for(int run = 0; ; ++run) { {% else %}
+    for(int run = 0; run < 2 * {{RUNS}}; ++run) { {% endif %}
         {% if FLUSH %}
         // flush the cache
         log("-> flushing the caches..."); 
@@ -298,45 +497,11 @@ int main(int argc, char **argv) {
         // apply the stencils and periodic boundary conditions
         log("-> apply stencils..."); 
         auto clock = start_timers(total_time, halo_time); 
-        {% for entry in SCHEDULE %}{% if entry.TYPE == "COMP" %}{% for group1 in entry.GROUP.GROUPS %}
-        #pragma omp parallel for schedule(static)
-        for(int idx = 0; idx < {{group1.NX}} * {{group1.NY}} * {{group1.NZ}}; ++idx) { 
-            // initialize array views
-            loop_info tile = _tiles_group{{group1.ID}}[idx]; 
-            {% for input in group1.INPUTS %}{% if input in TILING.INPUTS %}
-            array_view_3d {{input}}(&__{{input}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% else %}
-            sarray_view_3d {{input}}(&__{{input}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% endif %}{% endfor %}{% for output in group1.OUTPUTS %}{% if output in TILING.OUTPUTS %}
-            array_view_3d {{output}}(&__{{output}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% else %}
-            sarray_view_3d {{output}}(&__{{output}}(tile.ibeg, tile.jbeg, tile.kbeg)); {% endif %}{% endfor %}
-            {% for temp in group1.TEMPS %}
-            tarray{{group1.ID}}_3d ___{{temp}}; {% endfor %}{% for temp in group1.TEMPS %}
-            tarray{{group1.ID}}_view_3d {{temp}}(&___{{temp}}(HX, HY, HZ)); {% endfor %}
-            {% for stencil in group1.STENCILS %}
-            {
-                // apply {{stencil.NAME}} stencil
-                int ibeg = _loops_{{stencil.NAME}}[idx].ibeg;
-                int iend = _loops_{{stencil.NAME}}[idx].iend;
-                int jbeg = _loops_{{stencil.NAME}}[idx].jbeg;
-                int jend = _loops_{{stencil.NAME}}[idx].jend;
-                int kbeg = _loops_{{stencil.NAME}}[idx].kbeg;
-                int kend = _loops_{{stencil.NAME}}[idx].kend;
-
-                for(int k = kbeg; k < kend; ++k)
-                    for(int j = jbeg; j < jend; ++j)
-                        #pragma omp simd
-                        for(int i = ibeg; i < iend; ++i) {
-                            assert(i >= -HX && i < TX{{group1.ID}} + HX);
-                            assert(j >= -HY && j < TY{{group1.ID}} + HY);
-                            assert(k >= -HZ && k < TZ{{group1.ID}} + HZ);
-
-                            {{stencil.LAMBDA}}
-                            {{stencil.NAME}}(i, j, k) = res;           
-                        } 
-            }{% endfor %}
-        }
-        clock = update_timers(clock, total_time);
+        {% for entry in SCHEDULE %}{% if entry.TYPE == "PUT" %}
+        // start the group{{entry.GROUP.ID}} halo update
+        double halo_update{{entry.GROUP.ID}} = 0.0;
         #pragma omp parallel
-        {   {% for output in group1.OUTPUTS %}
+        {   {% for output in entry.GROUP.HALOS %}
             // mirror the i dimension
             #pragma omp for schedule(static) nowait 
             for(int k = 0; k < Z + 2 * HZ; ++k)
@@ -364,17 +529,63 @@ int main(int argc, char **argv) {
                         _{{output}}(i,j,k+Z+HZ) = _{{output}}(i,j,k+HZ);
                     }
             {% endfor %}
+            // the halo update ends when the last thread finished its mirror loops
+            double elapsed = elapsed_time(clock);
+            #pragma omp critical
+            halo_update{{entry.GROUP.ID}} = std::max(halo_update{{entry.GROUP.ID}}, elapsed);
+            {% elif entry.TYPE == "WAIT" %}
+        } // wait for the group{{entry.GROUP.ID}} halo update
+        // the halo time excludes the interior tiles computed during the update
+        clock = update_timers(clock, total_time);
+        halo_time += halo_update{{entry.GROUP.ID}};
+        {% elif entry.TYPE == "COMP" and entry.TILES == "INTERIOR" %}{% for group1 in entry.GROUP.GROUPS %}
+            // apply the interior tiles while the halos are updated
+            #pragma omp for schedule(static) nowait
+            for(int tdx = 0; tdx < static_cast<int>(_interior_group{{group1.ID}}.size()); ++tdx) { 
+                int idx = _interior_group{{group1.ID}}[tdx]; 
+                {{ apply_tile(group1) }}
+            }{% endfor %}
+        {% elif entry.TYPE == "COMP" and entry.TILES == "BOUNDARY" %}{% for group1 in entry.GROUP.GROUPS %}
+        // apply the boundary tiles after the halo update
+        #pragma omp parallel for schedule(static)
+        for(int tdx = 0; tdx < static_cast<int>(_boundary_group{{group1.ID}}.size()); ++tdx) { 
+            int idx = _boundary_group{{group1.ID}}[tdx]; 
+            {{ apply_tile(group1) }}
+        }
+        clock = update_timers(clock, total_time);
+        {% endfor %}{% elif entry.TYPE == "COMP" %}{% for group1 in entry.GROUP.GROUPS %}
+        #pragma omp parallel for schedule(static)
+        for(int idx = 0; idx < {{group1.NX}} * {{group1.NY}} * {{group1.NZ}}; ++idx) { 
+            {{ apply_tile(group1) }}
         }
-        clock = update_timers(clock, total_time, halo_time);
+        clock = update_timers(clock, total_time);
         {% endfor %}{% endif %}{% endfor %}
         // compute timing statistics    
-        if(run % 2 == 1) {
+        if(run % 2 == 1) { {% if ADAPTIVE %}
+            double elapsed = std::chrono::duration<double>(
+                std::chrono::high_resolution_clock::now() - budget).count();
+            if(!check_steady(warmup, {{ADAPTIVE.WINDOW}}, {{ADAPTIVE.WIDTH}})) {
+                // only print the measurements after the warm-up
+                log("   - warmup time [ms]: ", total_time);
+                warmup.push_back(total_time);
+            } else {
+                log("   - total time (min/median/max) [ms]: ", total_time);
+                log("   - halo time (min/median/max) [ms]: ",  halo_time);
+                samples.push_back(total_time);
+                if(compute_interval(samples, low, high) &&
+                   high - low <= {{ADAPTIVE.WIDTH}} * compute_median(samples))
+                    break;
+            }
+            if(elapsed > {{ADAPTIVE.BUDGET}})
+                break; {% else %}
             log("   - total time (min/median/max) [ms]: ", total_time);
-            log("   - halo time (min/median/max) [ms]: ",  halo_time);
+            log("   - halo time (min/median/max) [ms]: ",  halo_time); {% endif %}
             // wait for 100 ms
             std::this_thread::sleep_for(std::chrono::milliseconds(100));
         }
-    } 
+    } {% if ADAPTIVE %}
+    log("   - samples ", samples.size(), " after ", warmup.size(), " warmup runs");
+    log("   - median interval [ms]: ", low, "/", high); {% endif %}
     {% if VERIFY %}
     // verify all output arrays
     log("-> verifying...");